@@ -52,13 +52,14 @@ class GoalScorerInline(admin.TabularInline):
 
 @admin.register(Match)
 class MatchAdmin(admin.ModelAdmin):
-    readonly_fields = ('available_for_betting',)
+    readonly_fields = ('available_for_betting', 'bet_stats')
     fields = (
         ('home_team', 'home_score'),
         ('away_team', 'away_score'),
         'tournament_stage',
         'date_and_time',
         'available_for_betting',
+        'bet_stats',
     )
     list_display = ('date_and_time', 'tournament_stage', 'display_match',
                     'home_score', 'away_score', 'available_for_betting')
@@ -90,6 +91,7 @@ class BetAdmin(admin.ModelAdmin):
 class ExtraBetAdmin(admin.ModelAdmin):
     readonly_fields = ('points', 'created', 'updated')
     fields = ('player', 'team', 'footballer', 'points', 'created', 'updated')
+    autocomplete_fields = ('team', 'footballer')
     list_display = ('player', 'team', 'footballer', 'points', 'created', 'updated')
     list_filter = ('player', 'team', 'footballer')
     search_fields = ('player', 'team', 'footballer')
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BetappConfig(AppConfig):
     name = 'betapp'
+
+    def ready(self):
+        # Imported to connect their receivers.
+        from . import choices, live, reference, snapshots, standings, user_cache  # noqa: F401
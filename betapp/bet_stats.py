@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from django.db import router, transaction, IntegrityError
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Match, Bet, MatchBetStats, ScorelineCount
+
+
+def close_betting():
+    """Store the bet distribution of every match that has kicked off and has no statistics yet.
+
+    Betting on a match ends at kickoff, so its bets never change afterwards and are counted once, with
+    a single GROUP BY over all newly closed matches. Returns the number of matches processed.
+    """
+    # Read what was written on the primary: bets placed seconds before kickoff may not be on a replica yet.
+    database = router.db_for_write(MatchBetStats)
+    closed = list(Match.objects.using(database).filter(date_and_time__lte=timezone.now(), bet_stats__isnull=True)
+                  .order_by().values_list('id', flat=True))
+    if not closed:
+        return 0
+
+    counts = Bet.objects.using(database) \
+        .filter(match__in=closed, home_score__isnull=False, away_score__isnull=False).order_by() \
+        .values('match', 'home_score', 'away_score').annotate(count=Count('id')) \
+        .values_list('match', 'home_score', 'away_score', 'count')
+
+    scorelines = defaultdict(list)
+    for match_id, home_score, away_score, count in counts:
+        scorelines[match_id].append((home_score, away_score, count))
+
+    stats = []
+    for match_id in closed:
+        match_stats = MatchBetStats(match_id=match_id)
+        for home_score, away_score, count in scorelines[match_id]:
+            match_stats.bets_count += count
+            if home_score > away_score:
+                match_stats.home_wins += count
+            elif home_score == away_score:
+                match_stats.draws += count
+            else:
+                match_stats.away_wins += count
+        stats.append(match_stats)
+
+    try:
+        with transaction.atomic(using=database):
+            MatchBetStats.objects.using(database).bulk_create(stats)
+            stats_ids = dict(MatchBetStats.objects.using(database).filter(match__in=closed)
+                             .values_list('match', 'id'))
+            ScorelineCount.objects.using(database).bulk_create(
+                [ScorelineCount(stats_id=stats_ids[match_id], home_score=home_score, away_score=away_score,
+                                count=count)
+                 for match_id, rows in scorelines.items() for home_score, away_score, count in rows],
+                batch_size=1000)
+    except IntegrityError:
+        # An overlapping run closed the same matches first.
+        return 0
+    return len(closed)
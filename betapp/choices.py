@@ -0,0 +1,101 @@
+"""Cached choices for the extra bets form and a prefix index for footballer autocomplete."""
+import hashlib
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Team, Footballer
+
+
+TEAMS_KEY = 'choices:teams:{}'
+FOOTBALLERS_KEY = 'choices:footballers:{}'
+# Entries of older versions are never read again and expire on their own.
+CACHE_SECONDS = 24 * 60 * 60
+# Seconds a process trusts its version before comparing it with the database again. Saves made in the same
+# process are seen at once; bulk imports and changes made by other workers after at most this.
+VERSION_CHECK_SECONDS = 5
+
+_version = {'version': None, 'checked': 0}
+# Sorted, case-folded footballer names of this process, rebuilt when the version changes.
+_index = {'version': None, 'keys': [], 'rows': [], 'names': {}}
+_index_lock = threading.Lock()
+
+
+def choices_version():
+    """Return a key that changes whenever a team or a footballer is created, changed or deleted."""
+    if _version['version'] is None or time.monotonic() - _version['checked'] >= VERSION_CHECK_SECONDS:
+        parts = [model.objects.order_by().aggregate(Max('updated'), Count('id')) for model in (Team, Footballer)]
+        _version.update(version=hashlib.md5(repr(parts).encode()).hexdigest(), checked=time.monotonic())
+    return _version['version']
+
+
+def team_choices():
+    key = TEAMS_KEY.format(choices_version())
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(Team.objects.values_list('id', 'name'))
+        cache.set(key, choices, CACHE_SECONDS)
+    return choices
+
+
+def _footballers(version):
+    """Return ``[(id, name, team name), ...]`` from the cache, filling it from the database on a miss."""
+    key = FOOTBALLERS_KEY.format(version)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Footballer.objects.order_by('name').values_list('id', 'name', 'team__name'))
+        cache.set(key, rows, CACHE_SECONDS)
+    return rows
+
+
+def _current_index():
+    version = choices_version()
+    if version != _index['version']:
+        with _index_lock:
+            if version != _index['version']:
+                rows = sorted(_footballers(version), key=lambda row: row[1].casefold())
+                _index.update(version=version,
+                              keys=[row[1].casefold() for row in rows],
+                              rows=rows,
+                              names={row[0]: row[1] for row in rows})
+    return _index
+
+
+def search_footballers(prefix, limit=10):
+    """Return up to ``limit`` footballers whose name starts with ``prefix``, ignoring case."""
+    prefix = prefix.strip().casefold()
+    if not prefix:
+        return []
+    index = _current_index()
+    results = []
+    position = bisect_left(index['keys'], prefix)
+    while position < len(index['keys']) and index['keys'][position].startswith(prefix) and len(results) < limit:
+        footballer_id, name, team = index['rows'][position]
+        results.append({'id': footballer_id, 'name': name, 'team': team})
+        position += 1
+    return results
+
+
+def footballer_name(footballer_id):
+    return _current_index()['names'].get(footballer_id)
+
+
+def reset():
+    """Forget the version and the footballer index of this process; cached entries are left alone."""
+    _version.update(version=None, checked=0)
+    with _index_lock:
+        _index.update(version=None, keys=[], rows=[], names={})
+
+
+@receiver(post_save, sender=Team)
+@receiver(post_delete, sender=Team)
+@receiver(post_save, sender=Footballer)
+@receiver(post_delete, sender=Footballer)
+def invalidate_choices(sender, **kwargs):
+    # Team names are part of footballer rows, so any change makes a new version of both lists.
+    _version['version'] = None
@@ -1,5 +1,6 @@
 from django import forms
-from .models import User, Bet, ExtraBets
+from .models import User, Footballer, Bet, ExtraBets
+from .choices import team_choices, footballer_name
 
 
 class UserRegistrationForm(forms.ModelForm):
@@ -36,6 +37,16 @@ class BetForm(forms.ModelForm):
 
 
 class ExtraBetsForm(forms.ModelForm):
+    # Footballers are picked by name with autocomplete instead of a select listing the whole squads.
+    footballer = forms.ModelChoiceField(queryset=Footballer.objects.all(), to_field_name='name',
+                                        widget=forms.TextInput(attrs={'list': 'footballers', 'autocomplete': 'off'}))
+
     class Meta:
         model = ExtraBets
         fields = ('footballer', 'team')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['team'].choices = [('', self.fields['team'].empty_label)] + team_choices()
+        if self.instance.footballer_id:
+            self.initial['footballer'] = footballer_name(self.instance.footballer_id)
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.dispatch import receiver
+
+from .models import Match, LiveUpdate
+from .routers import read_from_replica
+from .signals import rescored, on_commit_batched
+from .standings import standings
+
+
+# Older events are only useful for clients that were away for long, and those reload the page anyway.
+KEPT_EVENTS = 200
+POLL_INTERVAL = 1
+HEARTBEAT_INTERVAL = 15
+RECONNECT_DELAY_MS = 5000
+
+# Newest events of this process as (id, kind, payload) tuples, oldest first, shared by all open streams.
+_events = {'events': (), 'checked': 0.0}
+_events_lock = threading.Lock()
+
+
+def recent_events():
+    """Return the newest ``KEPT_EVENTS`` events as ``(id, kind, payload)`` tuples, oldest first.
+
+    The database is asked for events newer than the last one seen at most once per poll interval per process,
+    however many streams are open; the streams read their events from the returned tuple.
+    """
+    with _events_lock:
+        now = time.monotonic()
+        if now - _events['checked'] >= POLL_INTERVAL:
+            events = _events['events']
+            newest = events[-1][0] if events else 0
+            with read_from_replica():
+                new_events = tuple(LiveUpdate.objects.filter(id__gt=newest).order_by('id')
+                                   .values_list('id', 'kind', 'payload'))
+            if new_events:
+                _events['events'] = (events + new_events)[-KEPT_EVENTS:]
+            _events['checked'] = now
+        return _events['events']
+
+
+def latest_event_id():
+    """Return the id of the newest event."""
+    events = recent_events()
+    return events[-1][0] if events else 0
+
+
+def _close_connections():
+    # A stream sleeps most of the time; holding a connection per viewer would exhaust the database's limit.
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def publish_rescore(match_ids=()):
+    """Store the results of the matches in ``match_ids`` and the standings rows changed since the previous event."""
+    table = {str(row['player'].pk): {'player': row['player'].pk,
+                                     'place': row['place'],
+                                     'standard_points': row['standard_points'],
+                                     'extra_points': row['extra_points'],
+                                     'total_points': row['total_points']}
+             for row in standings()}
+
+    last_standings = LiveUpdate.objects.filter(kind=LiveUpdate.STANDINGS).order_by('-id').first()
+    previous = json.loads(last_standings.state) if last_standings else {}
+    changes = [row for pk, row in table.items() if previous.get(pk) != row]
+
+    events = [LiveUpdate(kind=LiveUpdate.RESULT,
+                         payload=json.dumps({'match': match.pk, 'result': match.display_result()}))
+              for match in Match.objects.filter(pk__in=match_ids).order_by('id')]
+    if changes:
+        events.append(LiveUpdate(kind=LiveUpdate.STANDINGS,
+                                 payload=json.dumps(changes),
+                                 state=json.dumps(table)))
+    if not events:
+        return
+
+    with transaction.atomic():
+        for event in events:
+            event.save()
+        newest = events[-1].id
+        stale = LiveUpdate.objects.filter(id__lte=newest - KEPT_EVENTS)
+        if changes:
+            stale = stale.exclude(id=newest)
+        elif last_standings:
+            stale = stale.exclude(id=last_standings.id)
+        stale.delete()
+
+
+@receiver(rescored)
+def publish_on_rescore(sender, match=None, **kwargs):
+    # Wait for the whole admin save (inlines included) to commit, so the standings are computed once on final data.
+    on_commit_batched('live', publish_rescore, match.pk if match is not None else None)
+
+
+def event_stream(last_id):
+    """Yield server-sent events newer than ``last_id``.
+
+    The stream ends after ``LIVE_STREAM_MAX_SECONDS``, so a sync worker thread is never held forever
+    and workers can be recycled; the browser reconnects with the last event id and misses nothing.
+    """
+    yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+    deadline = time.monotonic() + settings.LIVE_STREAM_MAX_SECONDS
+    idle = 0
+    while time.monotonic() < deadline:
+        events = [event for event in recent_events() if event[0] > last_id]
+        _close_connections()
+        if events:
+            for event_id, kind, payload in events:
+                last_id = event_id
+                yield f'id: {event_id}\nevent: {kind}\ndata: {payload}\n\n'
+            idle = 0
+        elif idle >= HEARTBEAT_INTERVAL:
+            # Comment line; writing it is what tells us the client has gone away.
+            yield ': keep-alive\n\n'
+            idle = 0
+        time.sleep(POLL_INTERVAL)
+        idle += POLL_INTERVAL
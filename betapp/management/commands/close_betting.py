@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from betapp.bet_stats import close_betting
+from betapp.snapshots import publish
+
+
+class Command(BaseCommand):
+    help = ('Store the bet distribution of the matches that have kicked off since the last run. Schedule it '
+            'every minute or so: the schedule and the all bets page show the statistics stored by it.')
+
+    def handle(self, *args, **options):
+        closed = close_betting()
+        self.stdout.write(f'Bet statistics stored for {closed} matches.')
+        if closed and settings.SNAPSHOT_ROOT:
+            # The bets of these matches are shown from kickoff on, not only once their result is entered.
+            changed = publish()
+            self.stdout.write(f'{len(changed)} snapshot files changed.')
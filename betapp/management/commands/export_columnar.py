@@ -0,0 +1,126 @@
+import json
+import os
+import time
+from array import array
+
+from django.core.management.base import BaseCommand, CommandError
+
+from betapp.models import Match, GoalScorer, Bet, ExtraBets
+from betapp.routers import read_from_replica
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for exports.
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet output is optional.
+    pyarrow = None
+
+
+# Missing values (no score yet, no points yet) are stored as -1.
+NULL = -1
+CHUNK_SIZE = 5000
+
+# Exported tables: {table: (model, ((column, lookup, array typecode), ...))}. Typecodes are the ones shared by
+# the array module and NumPy: h int16, i int32, q int64. Each typecode holds the whole range of the model field
+# (PositiveSmallIntegerField scores in int16, PositiveIntegerField points in int32), so any saved value fits.
+# Datetimes are exported as Unix seconds.
+TABLES = {
+    'matches': (Match, (
+        ('id', 'id', 'i'),
+        ('home_team_id', 'home_team_id', 'i'),
+        ('away_team_id', 'away_team_id', 'i'),
+        ('tournament_stage_id', 'tournament_stage_id', 'i'),
+        ('date_and_time', 'date_and_time', 'q'),
+        ('home_score', 'home_score', 'h'),
+        ('away_score', 'away_score', 'h'),
+    )),
+    'bets': (Bet, (
+        ('id', 'id', 'i'),
+        ('match_id', 'match_id', 'i'),
+        ('player_id', 'player_id', 'i'),
+        ('home_score', 'home_score', 'h'),
+        ('away_score', 'away_score', 'h'),
+        ('points', 'points', 'i'),
+    )),
+    'extra_bets': (ExtraBets, (
+        ('id', 'id', 'i'),
+        ('player_id', 'player_id', 'i'),
+        ('team_id', 'team_id', 'i'),
+        ('footballer_id', 'footballer_id', 'i'),
+        ('points', 'points', 'i'),
+    )),
+    'goal_scorers': (GoalScorer, (
+        ('id', 'id', 'i'),
+        ('match_id', 'match_id', 'i'),
+        ('footballer_id', 'footballer_id', 'i'),
+    )),
+}
+
+
+def read_columns(model, columns):
+    """Stream ``model`` rows in primary key order into one typed array per column.
+
+    Rows come from a server-side cursor in chunks, so memory holds the packed columns and a single chunk
+    of tuples, never the whole table as model instances.
+    """
+    arrays = [array(typecode) for _, _, typecode in columns]
+    datetimes = [typecode == 'q' for _, _, typecode in columns]
+    rows = model.objects.order_by('pk').values_list(*[lookup for _, lookup, _ in columns])
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        for values, is_datetime, value in zip(arrays, datetimes, row):
+            if value is None:
+                value = NULL
+            elif is_datetime:
+                value = int(value.timestamp())
+            values.append(value)
+    return {name: np.frombuffer(values, dtype=values.typecode)
+            for (name, _, _), values in zip(columns, arrays)}
+
+
+class Command(BaseCommand):
+    help = ('Export matches, bets, extra bets and goal scorers as typed columns for offline analysis: one '
+            '<table>/<column>.npy file per column (load with numpy.load(..., mmap_mode="r")), or one '
+            '<table>.parquet file per table. Missing scores and points are -1 in .npy files and null in Parquet.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Directory the files are written to.')
+        parser.add_argument('--format', choices=('npy', 'parquet'), default='npy')
+        parser.add_argument('--tables', nargs='+', choices=tuple(TABLES), default=tuple(TABLES))
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('Columnar export requires NumPy.')
+        if options['format'] == 'parquet' and pyarrow is None:
+            raise CommandError('Parquet export requires pyarrow.')
+
+        start = time.perf_counter()
+        os.makedirs(options['output'], exist_ok=True)
+        manifest = {}
+        for table in options['tables']:
+            model, columns = TABLES[table]
+            with read_from_replica():
+                data = read_columns(model, columns)
+            getattr(self, f'write_{options["format"]}')(options['output'], table, data)
+            rows = len(data['id'])
+            manifest[table] = {'rows': rows, 'columns': {name: str(values.dtype) for name, values in data.items()}}
+            self.stdout.write(f'{table}: {rows} rows.')
+
+        with open(os.path.join(options['output'], 'manifest.json'), 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Exported in {time.perf_counter() - start:.2f} s.'))
+
+    @staticmethod
+    def write_npy(output, table, data):
+        directory = os.path.join(output, table)
+        os.makedirs(directory, exist_ok=True)
+        for name, values in data.items():
+            np.save(os.path.join(directory, f'{name}.npy'), values)
+
+    @staticmethod
+    def write_parquet(output, table, data):
+        columns = {name: pyarrow.array(values, mask=values == NULL) for name, values in data.items()}
+        pyarrow.parquet.write_table(pyarrow.table(columns), os.path.join(output, f'{table}.parquet'))
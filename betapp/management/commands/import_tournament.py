@@ -0,0 +1,217 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.db.models import Case, When, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from betapp.models import ScoringSystem, Team, Footballer, Match, GoalScorer, Bet, ExtraBets
+from betapp.signals import rescored
+
+
+# Sections in import order; later sections refer to earlier ones by name.
+SECTIONS = ('scoring_systems', 'teams', 'footballers', 'matches', 'goal_scorers')
+
+BATCH_SIZE = 500
+
+
+def _read_source(path):
+    """Return ``{section: [row, ...]}`` from a JSON file or from a directory of ``<section>.csv`` files."""
+    if os.path.isdir(path):
+        data = {}
+        for section in SECTIONS:
+            file_name = os.path.join(path, f'{section}.csv')
+            if os.path.exists(file_name):
+                with open(file_name, newline='', encoding='utf-8') as csv_file:
+                    data[section] = list(csv.DictReader(csv_file))
+        return data
+
+    with open(path, encoding='utf-8') as json_file:
+        data = json.load(json_file)
+    unknown = set(data) - set(SECTIONS)
+    if unknown:
+        raise CommandError(f'Unknown sections: {", ".join(sorted(unknown))}.')
+    return data
+
+
+def _integer(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def _boolean(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f'Invalid date and time: {value!r}.')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _bulk_update(model, objects, fields):
+    """Update ``fields`` of ``objects`` with one UPDATE ... CASE statement per batch."""
+    now = timezone.now()
+    for start in range(0, len(objects), BATCH_SIZE):
+        batch = objects[start:start + BATCH_SIZE]
+        values = {}
+        for field in fields:
+            output_field = models.IntegerField() if field.is_relation else field
+            values[field.name] = Case(*[When(pk=obj.pk, then=Value(getattr(obj, field.attname), output_field))
+                                        for obj in batch],
+                                      output_field=output_field)
+        model.objects.filter(pk__in=[obj.pk for obj in batch]).update(updated=now, **values)
+
+
+def _upsert(model, rows, key):
+    """Create or update ``model`` objects from ``rows`` (dicts of attribute values) matched by ``key``.
+
+    Returns the number of rows written. Rows that did not change are skipped. save() is not called,
+    so no rescoring cascade runs per row.
+    """
+    existing = {key(obj): obj for obj in model.objects.all()}
+    new_objects = []
+    changed_objects = []
+    changed_fields = set()
+
+    for values in rows:
+        obj = existing.get(key(model(**values)))
+        if obj is None:
+            new_objects.append(model(**values))
+            continue
+        fields = [name for name, value in values.items() if getattr(obj, name) != value]
+        if fields:
+            for name in fields:
+                setattr(obj, name, values[name])
+            changed_objects.append(obj)
+            changed_fields.update(fields)
+
+    model.objects.bulk_create(new_objects, batch_size=BATCH_SIZE)
+    if changed_objects:
+        fields = [field for field in model._meta.concrete_fields if field.attname in changed_fields]
+        _bulk_update(model, changed_objects, fields)
+    return len(new_objects) + len(changed_objects)
+
+
+class Command(BaseCommand):
+    help = 'Import scoring systems, teams, squads, fixtures, results and goal scorers in one transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='JSON file, or directory with <section>.csv files '
+                                           f'({", ".join(SECTIONS)}).')
+
+    def handle(self, *args, **options):
+        data = _read_source(options['source'])
+        self.goal_matches = set()
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            results = self._results()
+            written = 0
+            for section in SECTIONS:
+                if data.get(section):
+                    count = getattr(self, f'import_{section}')(data[section])
+                    self.stdout.write(f'{section}: {count} rows created or updated.')
+                    written += count
+
+            bets = Bet.objects.rescore()
+            extra_bets = ExtraBets.objects.rescore()
+            # Sent like Match.save() and GoalScorer.save() would, so live updates announce the imported results.
+            changed = [pk for pk, result in self._results().items() if result != results.get(pk, (None, None))]
+            for match in Match.objects.filter(pk__in=changed).order_by('date_and_time', 'id'):
+                rescored.send(sender=Match, match=match)
+            if extra_bets or self.goal_matches:
+                rescored.send(sender=ExtraBets, match=None, goal_matches=self.goal_matches)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'Rescored {bets} bets and {extra_bets} extra bets.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {written} rows in {elapsed:.2f} s ({written / max(elapsed, 1e-6):.0f} rows/s).'))
+
+    def import_scoring_systems(self, rows):
+        return _upsert(ScoringSystem, [{
+            'evaluated_field': row['evaluated_field'],
+            'short_name': row['short_name'],
+            'result_hitted': _integer(row.get('result_hitted')) or 0,
+            'goal_diff_hitted': _integer(row.get('goal_diff_hitted')) or 0,
+            'direction_hitted': _integer(row.get('direction_hitted')) or 0,
+            'other_points': _integer(row.get('other_points')) or 0,
+        } for row in rows], key=lambda obj: obj.evaluated_field)
+
+    def import_teams(self, rows):
+        return _upsert(Team, [{
+            'name': row['name'],
+            'short_name': row['short_name'],
+            'is_champion': _boolean(row.get('is_champion', False)),
+        } for row in rows], key=lambda obj: obj.name)
+
+    def import_footballers(self, rows):
+        teams = self._ids(Team, 'name')
+        return _upsert(Footballer, [{
+            'name': row['name'],
+            'team_id': self._lookup(teams, row['team'], 'team'),
+            'is_top_scorer': _boolean(row.get('is_top_scorer', False)),
+        } for row in rows], key=lambda obj: obj.name)
+
+    def import_matches(self, rows):
+        teams = self._ids(Team, 'name')
+        stages = self._ids(ScoringSystem, 'evaluated_field')
+        return _upsert(Match, [{
+            'home_team_id': self._lookup(teams, row['home_team'], 'team'),
+            'away_team_id': self._lookup(teams, row['away_team'], 'team'),
+            'tournament_stage_id': self._lookup(stages, row['tournament_stage'], 'tournament stage'),
+            'date_and_time': _datetime(row['date_and_time']),
+            'home_score': _integer(row.get('home_score')),
+            'away_score': _integer(row.get('away_score')),
+        } for row in rows], key=self._match_key)
+
+    def import_goal_scorers(self, rows):
+        """Replace the goal scorers of every match present in ``rows``; there is one row per goal."""
+        footballers = self._ids(Footballer, 'name')
+        matches = {self._match_key(match): match.id for match in Match.objects.all()}
+        teams = self._ids(Team, 'name')
+        stages = self._ids(ScoringSystem, 'evaluated_field')
+
+        goals = []
+        for row in rows:
+            key = (self._lookup(teams, row['home_team'], 'team'),
+                   self._lookup(teams, row['away_team'], 'team'),
+                   self._lookup(stages, row['tournament_stage'], 'tournament stage'))
+            goals.append(GoalScorer(footballer_id=self._lookup(footballers, row['footballer'], 'footballer'),
+                                    match_id=self._lookup(matches, key, 'match')))
+
+        self.goal_matches = {goal.match_id for goal in goals}
+        GoalScorer.objects.filter(match__in=self.goal_matches).delete()
+        GoalScorer.objects.bulk_create(goals, batch_size=BATCH_SIZE)
+        return len(goals)
+
+    @staticmethod
+    def _results():
+        return {pk: (home_score, away_score)
+                for pk, home_score, away_score in Match.objects.values_list('id', 'home_score', 'away_score')}
+
+    @staticmethod
+    def _match_key(match):
+        # Two teams meet at most once per tournament stage.
+        return match.home_team_id, match.away_team_id, match.tournament_stage_id
+
+    @staticmethod
+    def _ids(model, field):
+        return dict(model.objects.values_list(field, 'id'))
+
+    @staticmethod
+    def _lookup(ids, key, description):
+        try:
+            return ids[key]
+        except KeyError:
+            raise CommandError(f'Unknown {description}: {key}.')
@@ -0,0 +1,199 @@
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import build_opener, HTTPCookieProcessor, HTTPRedirectHandler, Request
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.shortcuts import resolve_url
+from django.urls import reverse
+from django.utils import timezone
+
+from betapp.models import User, ScoringSystem, Team, Match
+
+
+EMAIL = 'loadtest-{}@example.com'
+CSRF_INPUT = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+TOTAL_FORMS = re.compile(rb'name="form-TOTAL_FORMS" value="(\d+)"')
+UNIQUE_VIOLATION = re.compile(rb'IntegrityError|UNIQUE constraint|duplicate key', re.IGNORECASE)
+# Seeded teams are short named 'L' and two base 36 digits, to fit the three characters of Team.short_name.
+SHORT_NAME_DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+MAX_SEEDED_MATCHES = len(SHORT_NAME_DIGITS) ** 2 // 2
+
+
+class NoRedirect(HTTPRedirectHandler):
+    # A redirect after POST is the success response; following it would time another page.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def short_name(number):
+    high, low = divmod(number, len(SHORT_NAME_DIGITS))
+    return 'L' + SHORT_NAME_DIGITS[high] + SHORT_NAME_DIGITS[low]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.unique_violations = defaultdict(int)
+        self.failed_logins = []
+
+    def add(self, endpoint, seconds, ok, unique_violation=False):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.errors[endpoint] += not ok
+            self.unique_violations[endpoint] += unique_violation
+
+
+class Player:
+    """One simulated browser going through login, bet form and standings."""
+
+    def __init__(self, base_url, email, password, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.password = password
+        self.stats = stats
+        self.timeout = timeout
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect)
+
+    def request(self, endpoint, path, data=None, redirect_to=None):
+        """Time one request and return whether it succeeded, and its content.
+
+        A request succeeds with a redirect to ``redirect_to`` when given, otherwise with 200: a form shown again
+        after POST failed validation, and a redirect on GET usually leads to the login page.
+        """
+        body = urlencode(data).encode() if data is not None else None
+        headers = {'Referer': self.base_url + path}
+        start = time.perf_counter()
+        try:
+            response = self.opener.open(Request(self.base_url + path, data=body, headers=headers),
+                                        timeout=self.timeout)
+            status, location, content = response.status, None, response.read()
+        except HTTPError as error:
+            status, location, content = error.code, error.headers.get('Location'), error.read()
+        except (URLError, OSError):
+            status, location, content = 0, None, b''
+        if redirect_to is None:
+            ok = status == 200
+        else:
+            ok = status in (301, 302, 303) and urlsplit(location or '').path == redirect_to
+        self.stats.add(endpoint, time.perf_counter() - start, ok,
+                       status >= 500 and bool(UNIQUE_VIOLATION.search(content)))
+        return ok, content
+
+    @staticmethod
+    def csrf_token(content):
+        match = CSRF_INPUT.search(content)
+        return match.group(1).decode() if match else ''
+
+    def run(self):
+        _, page = self.request('login GET', reverse('login'))
+        logged_in, _ = self.request('login POST', reverse('login'), {'csrfmiddlewaretoken': self.csrf_token(page),
+                                                                     'username': self.email,
+                                                                     'password': self.password},
+                                    redirect_to=resolve_url(settings.LOGIN_REDIRECT_URL))
+        if not logged_in:
+            # Every following page would only time redirects to the login page.
+            with self.stats.lock:
+                self.stats.failed_logins.append(self.email)
+            return
+
+        _, page = self.request('bet_formset GET', reverse('bet_formset'))
+        total_forms = TOTAL_FORMS.search(page)
+        total_forms = int(total_forms.group(1)) if total_forms else 0
+        data = {'csrfmiddlewaretoken': self.csrf_token(page),
+                'form-TOTAL_FORMS': total_forms,
+                'form-INITIAL_FORMS': 0,
+                'form-MIN_NUM_FORMS': 0,
+                'form-MAX_NUM_FORMS': total_forms}
+        for number in range(total_forms):
+            data[f'form-{number}-home_score'] = random.randint(0, 3)
+            data[f'form-{number}-away_score'] = random.randint(0, 3)
+        self.request('bet_formset POST', reverse('bet_formset'), data, redirect_to=reverse('match_list'))
+
+        self.request('match_list GET', reverse('match_list'))
+        self.request('players_table GET', reverse('players_table'))
+
+
+class Command(BaseCommand):
+    help = ('Simulate the rush before kickoff against a running server: every player logs in, submits '
+            'the bet formset and opens the schedule and the standings at the same time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Address of the running server.')
+        parser.add_argument('--users', type=int, default=200, help='Number of simulated players.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Players active at the same time.')
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--matches', type=int, default=4,
+                            help='Matches created for betting when none is available.')
+        parser.add_argument('--seed', action='store_true',
+                            help='Create the players and matches in the database this command is configured with.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            if options['matches'] > MAX_SEEDED_MATCHES:
+                raise CommandError(f'At most {MAX_SEEDED_MATCHES} matches can be seeded.')
+            self.seed(options['users'], options['password'], options['matches'])
+
+        stats = Stats()
+        players = [Player(options['url'], EMAIL.format(number), options['password'], stats, options['timeout'])
+                   for number in range(options['users'])]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            list(executor.map(Player.run, players))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f'{"endpoint":20} {"requests":>8} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+                          f'{"p99 ms":>8} {"errors":>7} {"unique":>7}')
+        for endpoint, latencies in stats.latencies.items():
+            latencies.sort()
+            count = len(latencies)
+            self.stdout.write(f'{endpoint:20} {count:8} {count / elapsed:8.1f} '
+                              f'{percentile(latencies, 0.50) * 1000:8.0f} '
+                              f'{percentile(latencies, 0.95) * 1000:8.0f} '
+                              f'{percentile(latencies, 0.99) * 1000:8.0f} '
+                              f'{stats.errors[endpoint] / count:7.1%} '
+                              f'{stats.unique_violations[endpoint]:7}')
+        self.stdout.write(f'{len(players)} players in {elapsed:.1f} s.')
+        if stats.failed_logins:
+            self.stdout.write(self.style.WARNING(
+                f'{len(stats.failed_logins)} players could not log in and were stopped, e.g. '
+                f'{", ".join(sorted(stats.failed_logins)[:5])}. Seed them with --seed and check --password.'))
+
+    def seed(self, users, password, matches):
+        """Create active players sharing one password hash, and matches open for betting if there are none."""
+        existing = set(User.objects.filter(email__startswith='loadtest-').values_list('email', flat=True))
+        password_hash = make_password(password)
+        User.objects.bulk_create([User(email=EMAIL.format(number), password=password_hash, is_active=True,
+                                       first_name='Load', last_name=f'Test {number}')
+                                  for number in range(users) if EMAIL.format(number) not in existing],
+                                 batch_size=500)
+
+        if Match.available_bet_list().exists():
+            return
+        stage, _ = ScoringSystem.objects.get_or_create(evaluated_field='Group', defaults={
+            'short_name': 'GR', 'result_hitted': 3, 'goal_diff_hitted': 2, 'direction_hitted': 1})
+        kickoff = timezone.now() + timezone.timedelta(days=1)
+        for number in range(matches):
+            home_team, _ = Team.objects.get_or_create(name=f'Load Test {2 * number}',
+                                                      defaults={'short_name': short_name(2 * number)})
+            away_team, _ = Team.objects.get_or_create(name=f'Load Test {2 * number + 1}',
+                                                      defaults={'short_name': short_name(2 * number + 1)})
+            Match.objects.create(home_team=home_team, away_team=away_team, tournament_stage=stage,
+                                 date_and_time=kickoff + timezone.timedelta(hours=number))
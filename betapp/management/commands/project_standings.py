@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from betapp.projection import refresh_projection, ProjectionRunning
+
+
+class Command(BaseCommand):
+    help = ('Simulate the remaining matches, store the projection shown on the projection page and print the '
+            'chances of winning of the leading players. Run it after entering results, or from a scheduled job.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, help='Number of simulated tournaments.')
+        parser.add_argument('--workers', type=int, help='Number of worker processes.')
+        parser.add_argument('--seed', type=int, help='Random seed, for repeatable results.')
+        parser.add_argument('--top', type=int, default=10, help='Number of players to print.')
+
+    def handle(self, *args, **options):
+        try:
+            projection = refresh_projection(options['samples'], options['workers'], options['seed'])
+        except ProjectionRunning:
+            raise CommandError('Another process is simulating the projection.')
+        players = projection.players.select_related('player').order_by('-win')
+        for row in players[:options['top']]:
+            self.stdout.write(f'{row.player.email:40} {row.total_points:5} {row.win:8.2%} {row.top_three:8.2%}')
+        self.stdout.write(f'{players.count()} players simulated in {projection.elapsed:.2f} s.')
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from betapp.snapshots import publish
+
+
+class Command(BaseCommand):
+    help = 'Render the standings, results and all bets pages to static HTML and JSON files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='Target directory, SNAPSHOT_ROOT by default.')
+
+    def handle(self, *args, **options):
+        root = options['root'] or settings.SNAPSHOT_ROOT
+        if not root:
+            raise CommandError('Set SNAPSHOT_ROOT or pass --root.')
+        changed = publish(root, replica=True)
+        self.stdout.write(f'{len(changed)} files changed: {", ".join(changed) or "none"}.')
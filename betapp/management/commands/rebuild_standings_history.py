@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from betapp.models import StandingsSnapshot
+from betapp.standings import finished_matches, record_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the standings snapshots of all finished matches.'
+
+    def handle(self, *args, **options):
+        StandingsSnapshot.objects.all().delete()
+        first_match = finished_matches().first()
+        if first_match is not None:
+            record_snapshots(first_match)
+        self.stdout.write(f'{StandingsSnapshot.objects.count()} snapshots written.')
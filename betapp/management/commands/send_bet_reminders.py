@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from betapp.models import User, Match, BetReminder
+
+
+class RateLimiter:
+    """Let through at most ``rate`` calls per second, shared by all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0, slot - now))
+
+
+def recipients(match):
+    """Return active players with neither a bet on ``match`` nor a reminder about it, in one anti-join query."""
+    return User.objects.filter(is_active=True) \
+        .exclude(bets_placed__match=match) \
+        .exclude(bet_reminders__match=match) \
+        .values_list('id', 'email', 'first_name')
+
+
+class Command(BaseCommand):
+    help = 'Email players who have not bet yet on matches kicking off soon. Each player is reminded once per match.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Remind about matches available for betting that kick off within this many hours.')
+        parser.add_argument('--base-url', default='', help='Scheme and host put in front of the links in emails.')
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4, help='Threads, each with its own mail connection.')
+        parser.add_argument('--rate', type=float, default=10, help='Maximum emails per second, 0 for no limit.')
+
+    def handle(self, *args, **options):
+        deadline = timezone.now() + timezone.timedelta(hours=options['hours'])
+        matches = Match.available_bet_list().filter(date_and_time__lte=deadline) \
+            .select_related('home_team', 'away_team')
+
+        messages = []
+        for match in matches:
+            for player_id, email, first_name in recipients(match):
+                body = render_to_string('betapp/bet_reminder_email.txt', {
+                    'match': match, 'first_name': first_name, 'base_url': options['base_url']})
+                message = EmailMessage(f'Betting closes soon: {match.display_match()}', body, to=[email])
+                messages.append((match.id, player_id, message))
+
+        batch_size = options['batch_size']
+        batches = [messages[start:start + batch_size] for start in range(0, len(messages), batch_size)]
+        workers = max(1, min(options['workers'], len(batches)))
+        limiter = RateLimiter(options['rate'])
+        sent_batches = queue.Queue()
+
+        def send(worker_batches):
+            # One connection per worker, reused for all of its batches.
+            with get_connection() as connection:
+                for batch in worker_batches:
+                    sent = []
+                    try:
+                        for match_id, player_id, message in batch:
+                            limiter.wait()
+                            if connection.send_messages([message]):
+                                sent.append(BetReminder(match_id=match_id, player_id=player_id))
+                    finally:
+                        # Handed over even when sending fails part way, so delivered messages are not sent again.
+                        sent_batches.put(sent)
+
+        sent_count = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(send, batches[worker::workers]) for worker in range(workers)]
+            # The sent log is written here, batch by batch, so a failed worker keeps what it has already sent.
+            received = 0
+            while received < len(batches):
+                try:
+                    sent = sent_batches.get(timeout=1)
+                except queue.Empty:
+                    if all(future.done() for future in futures) and sent_batches.empty():
+                        break
+                    continue
+                BetReminder.objects.bulk_create(sent)
+                sent_count += len(sent)
+                received += 1
+            for future in futures:
+                future.result()
+
+        self.stdout.write(f'{sent_count} reminders sent for {len(matches)} matches.')
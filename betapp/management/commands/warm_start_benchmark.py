@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from betapp import choices, reference
+from betapp.models import User
+from betapp.views import bet_formset_view, extra_bets_form_view
+
+
+# Pages every player opens before kickoff that need the match calendar or the cached choices.
+PAGES = (
+    ('bet_formset', bet_formset_view),
+    ('extra_bets', extra_bets_form_view),
+)
+
+
+class Command(BaseCommand):
+    help = ('Compare the first requests of a freshly started worker with and without preloaded reference data. '
+            'Runs the views in this process against the configured database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Player the pages are rendered for (default: first active player).')
+        parser.add_argument('--requests', type=int, default=3, help='Requests per page and scenario.')
+
+    def handle(self, *args, **options):
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+        else:
+            user = User.objects.filter(is_active=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('No player to render the pages for.')
+
+        # The choices are cached in a private cache while measuring: emptying the configured one would log out
+        # the users of a shared cache and make every worker of the running site reload its data.
+        shared_cache, choices.cache = choices.cache, LocMemCache('warm_start_benchmark', {})
+        try:
+            self.measure(user, options['requests'])
+        finally:
+            choices.cache = shared_cache
+
+    def measure(self, user, requests):
+        # Compile templates and import lazily loaded code first, so both scenarios only differ in the data.
+        for _, view in PAGES:
+            self.get(view, user)
+
+        self.stdout.write(f'{"scenario":10} {"page":12} {"request":>7} {"ms":>8} {"queries":>8}')
+        for scenario in ('cold', 'preloaded'):
+            reference.reset()
+            choices.reset()
+            choices.cache.clear()
+            if scenario == 'preloaded':
+                start = time.perf_counter()
+                reference.preload()
+                self.stdout.write(f'{scenario:10} {"preload":12} {"":7} {(time.perf_counter() - start) * 1000:8.1f}')
+            for name, view in PAGES:
+                for number in range(1, requests + 1):
+                    elapsed, queries = self.get(view, user)
+                    self.stdout.write(f'{scenario:10} {name:12} {number:7} {elapsed * 1000:8.1f} {queries:8}')
+
+    @staticmethod
+    def get(view, user):
+        request = RequestFactory().get('/')
+        SessionMiddleware().process_request(request)
+        request.user = user
+        connection.queries_log.clear()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+            if hasattr(response, 'render'):
+                response.render()
+        return time.perf_counter() - start, len(queries)
@@ -0,0 +1,47 @@
+# Generated by Django 2.0.4 on 2026-10-19 12:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Model changes made before LiveUpdate without a migration. Databases that already have them (the InfoText table
+# and the altered User columns) mark this one as applied with: manage.py migrate betapp 0002_catch_up --fake
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InfoText',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200, unique=True)),
+                ('slug', models.SlugField(unique=True)),
+                ('text', models.TextField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='match',
+            name='tournament_stage',
+            field=models.ForeignKey(limit_choices_to={'other_points': 0}, on_delete=django.db.models.deletion.CASCADE, to='betapp.ScoringSystem'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='first_name',
+            field=models.CharField(max_length=30, verbose_name='first name'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_active',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='last_name',
+            field=models.CharField(max_length=50, verbose_name='last name'),
+        ),
+    ]
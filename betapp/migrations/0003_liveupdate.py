@@ -0,0 +1,26 @@
+# Generated by Django 2.0.4 on 2026-10-19 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0002_catch_up'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveUpdate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('standings', 'Standings'), ('result', 'Match result')], max_length=20)),
+                ('payload', models.TextField()),
+                ('state', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+    ]
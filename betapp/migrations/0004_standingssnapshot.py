@@ -0,0 +1,31 @@
+# Generated by Django 2.0.4 on 2026-10-19 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0003_liveupdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StandingsSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_points', models.PositiveIntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('place', models.PositiveIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings_snapshots', to='betapp.Match')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('match__date_and_time', 'place'),
+                'unique_together': {('match', 'player')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.0.4 on 2026-10-19 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0004_standingssnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BetReminder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent', models.DateTimeField(auto_now_add=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bet_reminders', to='betapp.Match')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bet_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-sent',),
+                'unique_together': {('match', 'player')},
+            },
+        ),
+    ]
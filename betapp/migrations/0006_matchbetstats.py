@@ -0,0 +1,43 @@
+# Generated by Django 2.0.4 on 2026-10-19 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0005_betreminder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchBetStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bets_count', models.PositiveIntegerField(default=0)),
+                ('home_wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('away_wins', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bet_stats', to='betapp.Match')),
+            ],
+            options={
+                'verbose_name_plural': 'Match bet stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='ScorelineCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('home_score', models.PositiveSmallIntegerField()),
+                ('away_score', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('stats', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scorelines', to='betapp.MatchBetStats')),
+            ],
+            options={
+                'ordering': ('-count', 'home_score', 'away_score'),
+                'unique_together': {('stats', 'home_score', 'away_score')},
+            },
+        ),
+    ]
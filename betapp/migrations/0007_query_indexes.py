@@ -0,0 +1,25 @@
+# Generated by Django 2.0.4 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0006_matchbetstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['player', 'points'], name='bet_player_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bet',
+            index=models.Index(fields=['match', 'home_score', 'away_score'], name='bet_match_scores_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['date_and_time', 'id'], name='match_kickoff_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.0.4 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='standingssnapshot',
+            name='bonus_points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.0.4 on 2026-10-19 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betapp', '0008_standingssnapshot_bonus_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Projection',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('elapsed', models.FloatField(default=0)),
+                ('computed', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlayerProjection',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.PositiveIntegerField()),
+                ('total_points', models.PositiveIntegerField()),
+                ('win', models.FloatField()),
+                ('top_three', models.FloatField()),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='projections', to=settings.AUTH_USER_MODEL)),
+                ('projection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='players', to='betapp.Projection')),
+            ],
+            options={
+                'ordering': ('place', 'player__last_name', 'player__first_name'),
+                'unique_together': {('projection', 'player')},
+            },
+        ),
+    ]
@@ -1,10 +1,16 @@
+from collections import defaultdict
+
 from django.db import models
+from django.db.models import Count
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .signals import rescored
+from .scoring import bet_points, extra_bet_points
+
 
 # Modification of authentication rules based on:
 # www.fomfus.com/articles/how-to-use-email-as-username-for-django-authentication-removing-the-username
@@ -57,6 +63,27 @@ class User(AbstractUser):
     objects = UserManager()
 
 
+class TrackedFieldsMixin:
+    """Remember the values of ``tracked_fields`` (attribute names) as they were loaded from the database."""
+
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.reset_tracking()
+        return instance
+
+    def reset_tracking(self):
+        self._loaded_values = {name: self.__dict__[name] for name in self.tracked_fields if name in self.__dict__}
+
+    def changed_fields(self):
+        """Return the tracked fields changed since loading; all of them for objects not loaded from the database."""
+        loaded = getattr(self, '_loaded_values', {})
+        return {name for name in self.tracked_fields
+                if name not in loaded or getattr(self, name) != loaded[name]}
+
+
 class ScoringSystem(models.Model):
     evaluated_field = models.CharField(max_length=20)
     short_name = models.CharField(max_length=3)
@@ -74,13 +101,15 @@ class ScoringSystem(models.Model):
         return self.evaluated_field
 
 
-class Team(models.Model):
+class Team(TrackedFieldsMixin, models.Model):
     name = models.CharField(max_length=50, unique=True)
     short_name = models.CharField(max_length=3, unique=True)
     is_champion = models.BooleanField(default=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    tracked_fields = ('is_champion',)
+
     class Meta:
         ordering = ('name',)
 
@@ -88,18 +117,23 @@ class Team(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
+        rescore = not self._state.adding and self.changed_fields()
         super().save(*args, **kwargs)
-        for bet in ExtraBets.objects.filter(team=self):
-            bet.save()
+        self.reset_tracking()
+        if rescore:
+            ExtraBets.objects.filter(team=self).rescore()
+            rescored.send(sender=self.__class__, match=None)
 
 
-class Footballer(models.Model):
+class Footballer(TrackedFieldsMixin, models.Model):
     name = models.CharField(max_length=50, unique=True)
     team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='footballers')
     is_top_scorer = models.BooleanField(default=False)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    tracked_fields = ('is_top_scorer',)
+
     class Meta:
         ordering = ('team', 'name',)
 
@@ -107,12 +141,15 @@ class Footballer(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
+        rescore = not self._state.adding and self.changed_fields()
         super().save(*args, **kwargs)
-        for bet in ExtraBets.objects.filter(footballer=self):
-            bet.save()
+        self.reset_tracking()
+        if rescore:
+            ExtraBets.objects.filter(footballer=self).rescore()
+            rescored.send(sender=self.__class__, match=None)
 
 
-class Match(models.Model):
+class Match(TrackedFieldsMixin, models.Model):
     home_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='home_matches')
     away_team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='away_matches')
     home_score = models.PositiveSmallIntegerField(null=True, blank=True)
@@ -123,8 +160,11 @@ class Match(models.Model):
     tournament_stage = models.ForeignKey(ScoringSystem, on_delete=models.CASCADE,
                                          limit_choices_to={'other_points': 0})
 
+    tracked_fields = ('home_score', 'away_score', 'tournament_stage_id')
+
     class Meta:
         ordering = ('date_and_time',)
+        indexes = [models.Index(fields=['date_and_time', 'id'], name='match_kickoff_idx')]
         verbose_name_plural = 'Matches'
 
     def __str__(self):
@@ -136,9 +176,12 @@ class Match(models.Model):
                                    'away_team': 'Must be different from home team.'})
 
     def save(self, *args, **kwargs):
+        rescore = not self._state.adding and self.changed_fields()
         super().save(*args, **kwargs)
-        for bet in self.bets.filter(match=self):
-            bet.save()
+        self.reset_tracking()
+        if rescore:
+            self.bets.all().rescore()
+            rescored.send(sender=self.__class__, match=self)
 
     def display_match(self):
         return f'{self.home_team.name} vs. {self.away_team.name}'
@@ -156,31 +199,41 @@ class Match(models.Model):
 
     @property
     def available_for_betting(self):
-        return self in Match.available_bet_list()
+        return self.pk in Match.available_bet_ids()
 
     @property
     def is_inside_date_ranges(self):
         return timezone.now() + timezone.timedelta(days=3) >= self.date_and_time > timezone.now()
 
+    @staticmethod
+    def available_bet_ids():
+        """Return ids of the matches open for betting: the next match of every team within three days."""
+        from .reference import reference_data  # reference imports this module
+
+        now = timezone.now()
+        ids = set()
+        list_of_teams = set()
+        for kickoff in reference_data().calendar:
+            if not now + timezone.timedelta(days=3) >= kickoff.date_and_time > now \
+                    or kickoff.home_team_id in list_of_teams or kickoff.away_team_id in list_of_teams:
+                continue
+            ids.add(kickoff.id)
+            list_of_teams.update((kickoff.home_team_id, kickoff.away_team_id))
+        return ids
+
     @staticmethod
     def available_bet_list():
-        matches = Match.objects.all()
-        list_of_teams = []
-        for match in matches:
-            if not match.is_inside_date_ranges or match.home_team in list_of_teams or match.away_team in list_of_teams:
-                matches = matches.exclude(id=match.id)
-            else:
-                list_of_teams.append(match.home_team)
-                list_of_teams.append(match.away_team)
-        return matches
+        return Match.objects.filter(id__in=Match.available_bet_ids())
 
 
-class GoalScorer(models.Model):
+class GoalScorer(TrackedFieldsMixin, models.Model):
     footballer = models.ForeignKey(Footballer, on_delete=models.CASCADE, related_name='footballer_goals')
     match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='match_goal_scorers')
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    tracked_fields = ('footballer_id', 'match_id')
+
     class Meta:
         ordering = ('footballer',)
 
@@ -192,9 +245,53 @@ class GoalScorer(models.Model):
             raise ValidationError({"footballer": "This footballer didn't play in this match!"})
 
     def save(self, *args, **kwargs):
+        if self.changed_fields():
+            # A scorer moved to another footballer or match takes a goal away from the previous one.
+            loaded_values = getattr(self, '_loaded_values', {})
+            footballers = {self.footballer_id, loaded_values.get('footballer_id')}
+            matches = {self.match_id, loaded_values.get('match_id')} - {None}
+        else:
+            footballers = set()
         super().save(*args, **kwargs)
-        for bet in ExtraBets.objects.filter(footballer=self.footballer):
-            bet.save()
+        self.reset_tracking()
+        if footballers:
+            ExtraBets.objects.filter(footballer__in=footballers - {None}).rescore()
+            rescored.send(sender=self.__class__, match=None, goal_matches=matches)
+
+
+def _update_points(queryset, points_by_id):
+    """Write new points with one UPDATE per distinct points value instead of one per row."""
+    ids_by_points = defaultdict(list)
+    for pk, points in points_by_id.items():
+        ids_by_points[points].append(pk)
+
+    now = timezone.now()
+    for points, ids in ids_by_points.items():
+        for start in range(0, len(ids), 500):
+            queryset.model._default_manager.filter(id__in=ids[start:start + 500]).update(points=points, updated=now)
+    return len(points_by_id)
+
+
+class BetQuerySet(models.QuerySet):
+    def rescore(self):
+        """Recompute points of the bets and return the number of bets changed.
+
+        Bets on matches without a result score nothing, so clearing a mistyped result takes its points back.
+        """
+        stages = {stage.id: stage for stage in ScoringSystem.objects.all()}
+        rows = self.order_by().values_list('id', 'points', 'home_score', 'away_score',
+                                           'match__home_score', 'match__away_score', 'match__tournament_stage')
+
+        changed = {}
+        for pk, points, home_score, away_score, match_home_score, match_away_score, stage_id in rows.iterator():
+            if match_home_score is None or match_away_score is None:
+                new_points = 0
+            else:
+                new_points = bet_points(match_home_score, match_away_score, home_score, away_score,
+                                        stages[stage_id])
+            if new_points != points:
+                changed[pk] = new_points
+        return _update_points(self, changed)
 
 
 class Bet(models.Model):
@@ -206,9 +303,17 @@ class Bet(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = BetQuerySet.as_manager()
+
     class Meta:
         unique_together = ('match', 'player')
         ordering = ('match__date_and_time', 'player', 'updated',)
+        indexes = [
+            # Covers the points sums of the standings without reading the table.
+            models.Index(fields=['player', 'points'], name='bet_player_points_idx'),
+            # Covers the scoreline counts of betapp.bet_stats.
+            models.Index(fields=['match', 'home_score', 'away_score'], name='bet_match_scores_idx'),
+        ]
 
     def __str__(self):
         result = f'{self.player.email} ({self.match.display_match()}, {self.display_bet()})'
@@ -225,25 +330,30 @@ class Bet(models.Model):
         return self.match.available_for_betting
 
     def save(self, *args, **kwargs):
-        if self.match.home_score is not None or self.match.away_score is not None:
-            match_goal_diff = self.match.home_score - self.match.away_score
-            bet_goal_diff = self.home_score - self.away_score
+        from .reference import reference_data
 
-            if self.match.home_score == self.home_score and self.match.away_score == self.away_score:
-                self.points = ScoringSystem.objects.get(evaluated_field=self.match.tournament_stage).result_hitted
+        if self.match.home_score is not None and self.match.away_score is not None:
+            self.points = bet_points(self.match.home_score, self.match.away_score, self.home_score, self.away_score,
+                                     reference_data().stages[self.match.tournament_stage_id])
 
-            elif match_goal_diff == bet_goal_diff:
-                self.points = ScoringSystem.objects.get(evaluated_field=self.match.tournament_stage).goal_diff_hitted
+        super().save(*args, **kwargs)
 
-            elif (self.match.home_score > self.match.away_score and self.home_score > self.away_score) or \
-                 (self.match.home_score < self.match.away_score and self.home_score < self.away_score) or \
-                 (self.match.home_score == self.match.away_score and self.home_score == self.away_score):
-                self.points = ScoringSystem.objects.get(evaluated_field=self.match.tournament_stage).direction_hitted
 
-            else:
-                self.points = 0
+class ExtraBetsQuerySet(models.QuerySet):
+    def rescore(self):
+        """Recompute points of the extra bets and return the number of extra bets changed."""
+        other_points = dict(ScoringSystem.objects.values_list('evaluated_field', 'other_points'))
+        goals = dict(GoalScorer.objects.filter(footballer__in=self.values('footballer')).order_by()
+                     .values('footballer').annotate(goals=Count('id')).values_list('footballer', 'goals'))
+        rows = self.order_by().values_list('id', 'points', 'footballer', 'footballer__is_top_scorer',
+                                           'team__is_champion')
 
-        super().save(*args, **kwargs)
+        changed = {}
+        for pk, points, footballer_id, is_top_scorer, is_champion in rows.iterator():
+            new_points = extra_bet_points(goals.get(footballer_id, 0), is_top_scorer, is_champion, other_points)
+            if new_points != points:
+                changed[pk] = new_points
+        return _update_points(self, changed)
 
 
 class ExtraBets(models.Model):
@@ -254,6 +364,8 @@ class ExtraBets(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = ExtraBetsQuerySet.as_manager()
+
     class Meta:
         ordering = ('player', 'footballer')
         verbose_name_plural = 'Extra Bets'
@@ -263,25 +375,22 @@ class ExtraBets(models.Model):
 
     @property
     def is_editable(self):
-        return timezone.now() < Match.objects.earliest('date_and_time').date_and_time
+        from .reference import reference_data
+
+        calendar = reference_data().calendar
+        if not calendar:
+            raise Match.DoesNotExist
+        return timezone.now() < calendar[0].date_and_time
 
     def save(self, *args, **kwargs):
-        footballer_goals = GoalScorer.objects.filter(footballer=self.footballer).count()
-        points_for_goals = footballer_goals * ScoringSystem.objects.get(evaluated_field='Goal').other_points
+        from .reference import reference_data
 
+        footballer_goals = GoalScorer.objects.filter(footballer=self.footballer).count()
         is_top_scorer = Footballer.objects.get(id=self.footballer.id).is_top_scorer
-        if is_top_scorer:
-            points_for_top_scorer = ScoringSystem.objects.get(evaluated_field='Top Scorer').other_points
-        else:
-            points_for_top_scorer = 0
-
         is_champion = Team.objects.get(id=self.team.id).is_champion
-        if is_champion:
-            points_for_champion = ScoringSystem.objects.get(evaluated_field='World Champion').other_points
-        else:
-            points_for_champion = 0
+        other_points = reference_data().other_points
 
-        self.points = points_for_goals + points_for_top_scorer + points_for_champion
+        self.points = extra_bet_points(footballer_goals, is_top_scorer, is_champion, other_points)
         super().save(*args, **kwargs)
 
 
@@ -294,3 +403,114 @@ class InfoText(models.Model):
 
     def __str__(self):
         return f'{self.title}'
+
+
+class StandingsSnapshot(models.Model):
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='standings_snapshots')
+    player = models.ForeignKey(User, on_delete=models.CASCADE, related_name='standings_snapshots')
+    match_points = models.PositiveIntegerField(default=0)
+    points = models.PositiveIntegerField(default=0)
+    # Top scorer and champion points included in points; only set on the snapshot of the last finished match.
+    bonus_points = models.PositiveIntegerField(default=0)
+    place = models.PositiveIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('match', 'player')
+        ordering = ('match__date_and_time', 'place')
+
+    def __str__(self):
+        return f'{self.player.email} after {self.match.display_match()}: {self.place}. ({self.points})'
+
+
+class MatchBetStats(models.Model):
+    match = models.OneToOneField(Match, on_delete=models.CASCADE, related_name='bet_stats')
+    bets_count = models.PositiveIntegerField(default=0)
+    home_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    away_wins = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'Match bet stats'
+
+    def __str__(self):
+        if not self.bets_count:
+            return 'No bets'
+        shares = ' / '.join(f'{label} {round(100 * count / self.bets_count)}%' for label, count in
+                            (('Home', self.home_wins), ('Draw', self.draws), ('Away', self.away_wins)))
+        scorelines = ', '.join(str(scoreline) for scoreline in self.scorelines.all()[:3])
+        return f'{shares}; {scorelines}'
+
+
+class ScorelineCount(models.Model):
+    stats = models.ForeignKey(MatchBetStats, on_delete=models.CASCADE, related_name='scorelines')
+    home_score = models.PositiveSmallIntegerField()
+    away_score = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('stats', 'home_score', 'away_score')
+        ordering = ('-count', 'home_score', 'away_score')
+
+    def __str__(self):
+        return f'{self.home_score}:{self.away_score} ({self.count})'
+
+
+class BetReminder(models.Model):
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='bet_reminders')
+    player = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bet_reminders')
+    sent = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('match', 'player')
+        ordering = ('-sent',)
+
+    def __str__(self):
+        return f'{self.player.email} ({self.match.display_match()})'
+
+
+class LiveUpdate(models.Model):
+    STANDINGS = 'standings'
+    RESULT = 'result'
+    KIND_CHOICES = (
+        (STANDINGS, 'Standings'),
+        (RESULT, 'Match result'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.TextField()
+    state = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.kind} #{self.id}'
+
+
+class Projection(models.Model):
+    """The last simulated projection of the final standings, written by the project_standings command."""
+    samples = models.PositiveIntegerField(default=0)
+    elapsed = models.FloatField(default=0)
+    computed = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.samples} samples at {self.computed}'
+
+
+class PlayerProjection(models.Model):
+    projection = models.ForeignKey(Projection, on_delete=models.CASCADE, related_name='players')
+    player = models.ForeignKey(User, on_delete=models.CASCADE, related_name='projections')
+    place = models.PositiveIntegerField()
+    total_points = models.PositiveIntegerField()
+    win = models.FloatField()
+    top_three = models.FloatField()
+
+    class Meta:
+        unique_together = ('projection', 'player')
+        ordering = ('place', 'player__last_name', 'player__first_name')
+
+    def __str__(self):
+        return f'{self.player.email}: {self.win:.1%}'
@@ -0,0 +1,187 @@
+"""Monte Carlo projection of the final standings over the matches that have no result yet.
+
+Every remaining match is simulated with independent Poisson goal counts for both teams, using the average number
+of goals per team in the finished matches. Open bets are scored with the same rules as ``scoring.bet_points``;
+extra bets count with the points they have now, since champion and top scorer are not simulated.
+
+Simulating takes seconds, so it never runs while a page is requested: the project_standings command (run it
+after entering results, or from a scheduled job) stores the projection in the database for all workers, and the
+projection page shows the stored one.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction, DatabaseError
+from django.utils import timezone
+
+from .models import Match, Bet, Projection, PlayerProjection
+from .standings import standings
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for projections.
+    np = None
+
+
+# Simulated scores are capped, so every outcome of a match is one of MAX_GOALS ** 2 scorelines.
+MAX_GOALS = 10
+DEFAULT_GOALS_PER_TEAM = 1.3
+# Samples scored at once; bounds memory to about CHUNK_SIZE * players * 4 bytes per step.
+CHUNK_SIZE = 500
+
+
+def _points_tables(bet_home, bet_away, stage_points):
+    """Return an array ``[match, scoreline, player]`` with the points each bet earns for every possible result.
+
+    ``bet_home``/``bet_away`` are ``[player, match]`` arrays with -1 where no bet was placed, ``stage_points``
+    holds result/goal difference/direction points per match. Scoreline index is ``home * MAX_GOALS + away``.
+    """
+    goals = np.arange(MAX_GOALS)
+    home = np.repeat(goals, MAX_GOALS)[:, None]
+    away = np.tile(goals, MAX_GOALS)[:, None]
+    tables = np.zeros((len(stage_points), MAX_GOALS ** 2, len(bet_home)), dtype=np.int16)
+
+    for match, (result, goal_diff, direction) in enumerate(stage_points):
+        match_home = bet_home[None, :, match]
+        match_away = bet_away[None, :, match]
+        points = np.where((home == match_home) & (away == match_away), result,
+                          np.where(home - away == match_home - match_away, goal_diff,
+                                   np.where(np.sign(home - away) == np.sign(match_home - match_away), direction, 0)))
+        tables[match] = np.where(match_home >= 0, points, 0)
+    return tables
+
+
+# Inputs of the simulation, set once per worker process instead of being sent with every chunk.
+_inputs = {}
+
+
+def _set_inputs(points_tables, base_points, goals_per_team):
+    _inputs.update(points_tables=points_tables, base_points=base_points, goals_per_team=goals_per_team)
+
+
+def _simulate(samples, seed):
+    """Return the summed win shares and top-three counts of every player over ``samples`` simulations."""
+    points_tables, base_points = _inputs['points_tables'], _inputs['base_points']
+    rng = np.random.default_rng(seed)
+    matches, _, players = points_tables.shape
+    wins = np.zeros(players)
+    top_three = np.zeros(players)
+
+    for start in range(0, samples, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, samples - start)
+        home = np.minimum(rng.poisson(_inputs['goals_per_team'], (size, matches)), MAX_GOALS - 1)
+        away = np.minimum(rng.poisson(_inputs['goals_per_team'], (size, matches)), MAX_GOALS - 1)
+        scorelines = home * MAX_GOALS + away
+
+        totals = np.repeat(base_points[None, :], size, axis=0)
+        for match in range(matches):
+            totals += points_tables[match][scorelines[:, match]]
+
+        best = totals.max(axis=1, keepdims=True)
+        leaders = totals == best
+        wins += (leaders / leaders.sum(axis=1, keepdims=True)).sum(axis=0)
+
+        third = np.partition(totals, -3, axis=1)[:, -3, None] if players >= 3 else totals.min(axis=1, keepdims=True)
+        top_three += (totals >= third).sum(axis=0)
+
+    return wins, top_three
+
+
+def project(samples=None, workers=None, seed=None):
+    """Simulate the remaining matches and return ``(players_list, elapsed seconds)``.
+
+    Each dict of ``players_list`` is a standings row extended with ``win`` and ``top_three`` probabilities.
+    Samples are split between ``workers`` processes when there are more than one chunk of them.
+    """
+    if np is None:
+        raise ImproperlyConfigured('Standings projection requires NumPy.')
+
+    samples = samples or settings.PROJECTION_SAMPLES
+    workers = workers or settings.PROJECTION_WORKERS or os.cpu_count()
+    start = time.perf_counter()
+
+    players_list = standings()
+    if not players_list:
+        return players_list, time.perf_counter() - start
+    player_index = {row['player'].pk: index for index, row in enumerate(players_list)}
+    base_points = np.array([row['total_points'] for row in players_list], dtype=np.int32)
+
+    remaining = list(Match.objects.exclude(home_score__isnull=False, away_score__isnull=False).order_by()
+                     .values_list('id', 'tournament_stage__result_hitted', 'tournament_stage__goal_diff_hitted',
+                                  'tournament_stage__direction_hitted'))
+    match_index = {match_id: index for index, (match_id, *_) in enumerate(remaining)}
+    stage_points = np.array([points for _, *points in remaining], dtype=np.int32).reshape(-1, 3)
+
+    bet_home = np.full((len(players_list), len(remaining)), -1, dtype=np.int16)
+    bet_away = np.full_like(bet_home, -1)
+    bets = Bet.objects.filter(match__in=match_index, home_score__isnull=False, away_score__isnull=False) \
+        .order_by().values_list('player', 'match', 'home_score', 'away_score')
+    for player_id, match_id, home_score, away_score in bets.iterator():
+        bet_home[player_index[player_id], match_index[match_id]] = home_score
+        bet_away[player_index[player_id], match_index[match_id]] = away_score
+
+    finished = Match.objects.filter(home_score__isnull=False, away_score__isnull=False) \
+        .order_by().values_list('home_score', 'away_score')
+    goals = [home_score + away_score for home_score, away_score in finished]
+    goals_per_team = sum(goals) / (2 * len(goals)) if goals else DEFAULT_GOALS_PER_TEAM
+
+    inputs = (_points_tables(bet_home, bet_away, stage_points), base_points, goals_per_team)
+    chunks = [len(part) for part in np.array_split(np.arange(samples), max(1, min(workers, samples // CHUNK_SIZE)))]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+    if len(chunks) == 1:
+        _set_inputs(*inputs)
+        results = [_simulate(samples, seeds[0])]
+        _inputs.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=len(chunks), initializer=_set_inputs, initargs=inputs) as executor:
+            results = list(executor.map(_simulate, chunks, seeds))
+
+    wins = sum(result[0] for result in results) / samples
+    top_three = sum(result[1] for result in results) / samples
+    for index, row in enumerate(players_list):
+        row['win'] = float(wins[index])
+        row['top_three'] = float(top_three[index])
+    return players_list, time.perf_counter() - start
+
+
+class ProjectionRunning(Exception):
+    """Another process is simulating the projection."""
+
+
+def stored_projection():
+    """Return the last stored ``Projection``, or None before the first simulation."""
+    return Projection.objects.filter(computed__isnull=False).first()
+
+
+def refresh_projection(samples=None, workers=None, seed=None):
+    """Simulate the projection and store it in place of the previous one; return the stored ``Projection``.
+
+    Single flight: the projection row stays locked while simulating, and a second process raises
+    ``ProjectionRunning`` instead of simulating the same results again (on databases with SELECT ... FOR UPDATE
+    NOWAIT; elsewhere the last process to finish wins).
+    """
+    Projection.objects.get_or_create(pk=1)
+    with transaction.atomic():
+        try:
+            projection = Projection.objects.select_for_update(nowait=True).get(pk=1)
+        except DatabaseError:
+            raise ProjectionRunning()
+        players_list, elapsed = project(samples, workers, seed)
+
+        projection.players.all().delete()
+        PlayerProjection.objects.bulk_create([PlayerProjection(projection=projection,
+                                                               player=row['player'],
+                                                               place=row['place'],
+                                                               total_points=row['total_points'],
+                                                               win=row['win'],
+                                                               top_three=row['top_three'])
+                                              for row in players_list], batch_size=1000)
+        projection.samples = samples or settings.PROJECTION_SAMPLES
+        projection.elapsed = elapsed
+        projection.computed = timezone.now()
+        projection.save()
+    return projection
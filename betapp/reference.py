@@ -0,0 +1,96 @@
+"""Reference data needed by most requests, kept in memory: scoring systems and the match calendar.
+
+Each process holds one read-only snapshot made of tuples and dicts that is replaced, never mutated, when the
+data changes. Loaded by ``preload()`` in the gunicorn master before the workers are forked (``--preload``, see
+betproject/wsgi.py), the snapshot is shared between workers through copy-on-write and new workers skip the
+cold queries of their first requests.
+"""
+import gc
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from django.db import connections, DatabaseError
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .choices import team_choices, footballer_name
+from .models import ScoringSystem, Match
+
+
+Stage = namedtuple('Stage', 'id evaluated_field short_name result_hitted goal_diff_hitted direction_hitted '
+                            'other_points')
+Kickoff = namedtuple('Kickoff', 'id date_and_time home_team_id away_team_id')
+ReferenceData = namedtuple('ReferenceData', 'version stages other_points calendar')
+
+# Seconds a process trusts its snapshot before comparing it with the database version again. Saves made in
+# the same process are seen at once; changes made elsewhere (other workers, bulk imports) after at most this.
+VERSION_CHECK_SECONDS = 5
+
+_state = {'data': None, 'checked': 0}
+_lock = threading.Lock()
+
+
+def data_version():
+    """Return a key that changes whenever a scoring system or a match changes."""
+    parts = [model.objects.order_by().aggregate(Max('updated'), Count('id')) for model in (ScoringSystem, Match)]
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _load(version):
+    stages = {row[0]: Stage(*row) for row in ScoringSystem.objects.order_by().values_list(*Stage._fields)}
+    calendar = tuple(Kickoff(*row) for row in Match.objects.order_by('date_and_time', 'id')
+                     .values_list(*Kickoff._fields))
+    return ReferenceData(version=version,
+                         stages=stages,
+                         other_points={stage.evaluated_field: stage.other_points for stage in stages.values()},
+                         calendar=calendar)
+
+
+def reference_data():
+    """Return the current ``ReferenceData`` of this process, reloading it only when the data changed."""
+    data = _state['data']
+    if data is not None and time.monotonic() - _state['checked'] < VERSION_CHECK_SECONDS:
+        return data
+    with _lock:
+        data = _state['data']
+        if data is None or time.monotonic() - _state['checked'] >= VERSION_CHECK_SECONDS:
+            version = data_version()
+            if data is None or data.version != version:
+                data = _load(version)
+            _state.update(data=data, checked=time.monotonic())
+    return data
+
+
+def reset():
+    _state.update(data=None, checked=0)
+
+
+def preload():
+    """Load the reference data and the cached form choices of this process ahead of the first request.
+
+    Meant to run once before workers are forked: database connections are closed afterwards so that workers
+    do not share them, and the loaded objects are moved out of the garbage collector's reach (Python 3.7+) so
+    that collections do not touch, and thereby copy, the shared pages.
+    """
+    try:
+        reference_data()
+        team_choices()
+        footballer_name(None)
+    except DatabaseError:
+        # Not migrated yet; every worker loads the data on its first request instead.
+        return
+    finally:
+        connections.close_all()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+@receiver(post_save, sender=ScoringSystem)
+@receiver(post_delete, sender=ScoringSystem)
+@receiver(post_save, sender=Match)
+@receiver(post_delete, sender=Match)
+def invalidate_reference_data(sender, **kwargs):
+    reset()
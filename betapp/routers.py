@@ -0,0 +1,77 @@
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+
+# Set on a response after a write, so the same browser reads its own data from the primary for a while.
+PIN_COOKIE = 'pin_primary'
+
+_state = threading.local()
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+@contextmanager
+def read_from_replica():
+    """Send the reads made inside the block to a replica, if any is configured."""
+    previous = getattr(_state, 'replica', False)
+    _state.replica = True
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def use_replica(view):
+    """Decorate a read-only view so its queries go to a replica.
+
+    Writes and browsers that have just written (they carry the pin cookie) keep reading from the primary.
+    Template responses are rendered inside the block, since their templates run most of the queries.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or PIN_COOKIE in request.COOKIES:
+            return view(request, *args, **kwargs)
+        with read_from_replica():
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Route reads of views marked with ``use_replica`` to a random replica; everything else uses the primary."""
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if aliases and getattr(_state, 'replica', False):
+            return random.choice(aliases)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class PinPrimaryMiddleware:
+    """After a successful write, pin the browser to the primary until replicas have caught up."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method == 'POST' and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True)
+        return response
@@ -0,0 +1,35 @@
+# Scoring rules shared by the per-row save() cascades and the bulk rescoring querysets.
+
+GOAL = 'Goal'
+TOP_SCORER = 'Top Scorer'
+WORLD_CHAMPION = 'World Champion'
+
+
+def _sign(number):
+    return (number > 0) - (number < 0)
+
+
+def bet_points(match_home_score, match_away_score, bet_home_score, bet_away_score, stage):
+    """Return the points earned by a bet on a finished match, using the ``stage`` scoring system."""
+    if bet_home_score is None or bet_away_score is None:
+        return 0
+    if match_home_score == bet_home_score and match_away_score == bet_away_score:
+        return stage.result_hitted
+    if match_home_score - match_away_score == bet_home_score - bet_away_score:
+        return stage.goal_diff_hitted
+    if _sign(match_home_score - match_away_score) == _sign(bet_home_score - bet_away_score):
+        return stage.direction_hitted
+    return 0
+
+
+def extra_bet_points(footballer_goals, is_top_scorer, is_champion, other_points):
+    """Return the points earned by extra bets.
+
+    ``other_points`` maps ScoringSystem.evaluated_field to its other_points value.
+    """
+    points = footballer_goals * other_points[GOAL]
+    if is_top_scorer:
+        points += other_points[TOP_SCORER]
+    if is_champion:
+        points += other_points[WORLD_CHAMPION]
+    return points
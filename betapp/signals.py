@@ -0,0 +1,38 @@
+import threading
+
+from django.db import transaction
+from django.dispatch import Signal
+
+
+# Sent once a save cascade has finished re-saving the bets it affects.
+# ``match`` is the match whose result changed, or None when only extra bets were rescored. ``goal_matches`` holds
+# the ids of the matches whose goal scorers changed, if any.
+rescored = Signal(providing_args=['match', 'goal_matches'])
+
+_batches = threading.local()
+
+
+def on_commit_batched(name, func, value=None):
+    """Call ``func(values)`` once after the current transaction commits, however often it is queued under ``name``.
+
+    ``values`` is the set of non-None ``value`` arguments queued in the transaction. Every call queues a
+    callback; the first one still queued at commit runs ``func`` and the others of the same commit skip, so a
+    savepoint rolled back with the callbacks it queued does not stop the batch. Values of callbacks that Django
+    already dropped are forgotten when the next one is queued; values queued in a savepoint rolled back after
+    the last call may still be passed, which only costs receivers work, since they read the committed data.
+    Outside a transaction ``func`` runs at once.
+    """
+    connection = transaction.get_connection()
+    callbacks = _batches.__dict__.setdefault(name, {})
+    pending = {callback for _, callback in connection.run_on_commit}
+    for callback in set(callbacks) - pending:
+        del callbacks[callback]
+
+    def run():
+        if run in callbacks:
+            values = {value for value in callbacks.values() if value is not None}
+            callbacks.clear()
+            func(values)
+
+    callbacks[run] = value
+    transaction.on_commit(run)
@@ -0,0 +1,105 @@
+"""Static copies of the public pages, written into SNAPSHOT_ROOT for the web server to serve without Django."""
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import User, Match, Bet, ExtraBets
+from .routers import read_from_replica
+from .signals import rescored, on_commit_batched
+from .standings import standings
+
+
+def write_if_changed(path, content):
+    """Atomically replace ``path`` with ``content`` unless it already holds the same bytes; return True if written."""
+    digest = hashlib.sha256(content).digest()
+    try:
+        with open(path, 'rb') as current:
+            if hashlib.sha256(current.read()).digest() == digest:
+                return False
+    except FileNotFoundError:
+        pass
+
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.', delete=False) as temporary:
+        temporary.write(content)
+    os.chmod(temporary.name, 0o644)
+    os.replace(temporary.name, path)
+    return True
+
+
+def all_bets_grid(matches):
+    """Return ``(player, extra_bets, [bet or None per match])`` rows for the started ``matches``."""
+    bets = {(bet.player_id, bet.match_id): bet for bet in Bet.objects.filter(match__in=matches).order_by()}
+    extra_bets = {extra.player_id: extra
+                  for extra in ExtraBets.objects.select_related('team', 'footballer').order_by()}
+    return [(player, extra_bets.get(player.id), [bets.get((player.id, match.id)) for match in matches])
+            for player in User.objects.order_by('last_name', 'first_name')]
+
+
+def render_files():
+    """Return ``{file name: bytes}`` for the standings, results and all bets pages, in HTML and JSON."""
+    players_list = standings()
+    matches = list(Match.objects.select_related('home_team', 'away_team', 'tournament_stage'))
+    started = [match for match in matches if match.date_and_time <= timezone.now()]
+    grid = all_bets_grid(started)
+
+    context = {'static_snapshot': True}
+    pages = {
+        'standings.html': render_to_string('betapp/players_table.html', dict(context, players_list=players_list)),
+        'results.html': render_to_string('betapp/snapshots/results.html', dict(context, matches=matches)),
+        'all_bets.html': render_to_string('betapp/snapshots/all_bets.html',
+                                          dict(context, matches=started, grid=grid)),
+    }
+    data = {
+        'standings.json': [{'place': row['place'],
+                            'player': f'{row["player"].first_name} {row["player"].last_name}',
+                            'standard_points': row['standard_points'],
+                            'extra_points': row['extra_points'],
+                            'total_points': row['total_points']} for row in players_list],
+        'results.json': [{'id': match.id,
+                          'date_and_time': match.date_and_time,
+                          'stage': str(match.tournament_stage),
+                          'home_team': match.home_team.name,
+                          'away_team': match.away_team.name,
+                          'home_score': match.home_score,
+                          'away_score': match.away_score} for match in matches],
+        'all_bets.json': [{'player': f'{player.first_name} {player.last_name}',
+                           'team': extra.team.name if extra else None,
+                           'footballer': extra.footballer.name if extra else None,
+                           'bets': {match.id: [bet.home_score, bet.away_score, bet.points]
+                                    for match, bet in zip(started, bets) if bet is not None}}
+                          for player, extra, bets in grid],
+    }
+
+    files = {name: content.encode() for name, content in pages.items()}
+    files.update({name: json.dumps(value, cls=DjangoJSONEncoder, sort_keys=True).encode()
+                  for name, value in data.items()})
+    return files
+
+
+def publish(root=None, replica=False):
+    """Write the snapshot files into ``root`` (SNAPSHOT_ROOT by default) and return the names of changed ones.
+
+    Right after rescoring the data is read from the primary, since a replica may not have the new points yet.
+    """
+    root = root or settings.SNAPSHOT_ROOT
+    os.makedirs(root, exist_ok=True)
+    if replica:
+        with read_from_replica():
+            files = render_files()
+    else:
+        files = render_files()
+    return [name for name, content in files.items() if write_if_changed(os.path.join(root, name), content)]
+
+
+@receiver(rescored)
+def publish_on_rescore(sender, **kwargs):
+    if settings.SNAPSHOT_ROOT:
+        on_commit_batched('snapshots', lambda match_ids: publish())
@@ -0,0 +1,160 @@
+from collections import Counter, defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Sum, IntegerField, OuterRef, Subquery, Q
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+
+from .models import User, Match, Bet, ExtraBets, GoalScorer, StandingsSnapshot
+from .reference import reference_data
+from .scoring import extra_bet_points
+from .signals import rescored, on_commit_batched
+
+
+def _with_places(rows, points):
+    """Yield ``(place, row)`` for rows sorted best first; rows with equal points share a place."""
+    place = 0
+    previous_points = None
+    for counter, row in enumerate(rows, start=1):
+        if points(row) != previous_points:
+            place = counter
+            previous_points = points(row)
+        yield place, row
+
+
+def standings():
+    """Return the players table as a list of dicts, best player first.
+
+    Points of all players are summed by the database in one query instead of two aggregates per player.
+    Players with equal points share a place, the same way the standings template numbers them.
+    """
+    bet_points = Bet.objects.filter(player=OuterRef('pk')).order_by().values('player') \
+        .annotate(points_sum=Sum('points')).values('points_sum')
+    extra_points = ExtraBets.objects.filter(player=OuterRef('pk')).order_by().values('points')[:1]
+
+    users = User.objects.annotate(
+        standard_points=Coalesce(Subquery(bet_points, output_field=IntegerField()), 0),
+        extra_points=Coalesce(Subquery(extra_points, output_field=IntegerField()), 0),
+    ).order_by()
+    # Summed and sorted here: ordering by the sum in SQL would evaluate both subqueries twice per player.
+    rows = sorted(({'player': user,
+                    'standard_points': user.standard_points,
+                    'extra_points': user.extra_points,
+                    'total_points': user.standard_points + user.extra_points} for user in users),
+                  key=lambda row: (-row['total_points'], row['player'].last_name, row['player'].first_name))
+
+    for place, row in _with_places(rows, lambda row: row['total_points']):
+        row['place'] = place
+    return rows
+
+
+def finished_matches():
+    return Match.objects.filter(home_score__isnull=False, away_score__isnull=False).order_by('date_and_time', 'id')
+
+
+def head_to_head(players):
+    """Return one row per finished match any of ``players`` bet on, oldest first.
+
+    Each row is ``{'match': match, 'cells': [(bet, total, difference), ...]}`` with one cell per player, in
+    ``players`` order: the bet (or None), the player's match points so far and their difference to the first
+    player's. All bets are read with one query filtered on the players, whatever the size of the league.
+    """
+    index = {player.pk: number for number, player in enumerate(players)}
+    bets = Bet.objects.filter(player__in=players, match__home_score__isnull=False, match__away_score__isnull=False) \
+        .select_related('match__home_team', 'match__away_team').order_by('match__date_and_time', 'match_id')
+
+    rows = []
+    totals = [0] * len(players)
+    for _, match_bets in groupby(bets, key=lambda bet: bet.match_id):
+        match_bets = list(match_bets)
+        player_bets = [None] * len(players)
+        for bet in match_bets:
+            player_bets[index[bet.player_id]] = bet
+            totals[index[bet.player_id]] += bet.points or 0
+        rows.append({'match': match_bets[0].match,
+                     'cells': [(bet, total, total - totals[0]) for bet, total in zip(player_bets, totals)]})
+    return rows
+
+
+def record_snapshots(match):
+    """Rewrite the standings snapshots of ``match`` and of every finished match played after it.
+
+    A player's points for a match are the points of their bet plus the goal points their extra bets earned in
+    that match. Top scorer and champion points are added at the last finished match, so the latest snapshot
+    agrees with the standings table. Cumulative points are carried over from the snapshot of the previous
+    finished match, so entering the latest result only reads the bets and goals of that one match.
+    """
+    not_before = Q(date_and_time__gt=match.date_and_time) | Q(date_and_time=match.date_and_time, id__gte=match.id)
+    matches = list(finished_matches().filter(not_before))
+    previous_match = finished_matches().exclude(not_before).last()
+    if StandingsSnapshot.objects.filter(match=previous_match, bonus_points__gt=0).exists():
+        # The previous match was the last one and its bonus moves to a later match: rewrite it too.
+        return record_snapshots(previous_match)
+
+    totals = dict.fromkeys(User.objects.values_list('id', flat=True), 0)
+    if previous_match is not None:
+        totals.update(StandingsSnapshot.objects.filter(match=previous_match).values_list('player', 'points'))
+
+    other_points = reference_data().other_points
+    extra_bets = ExtraBets.objects.order_by().values_list('player', 'footballer', 'footballer__is_top_scorer',
+                                                          'team__is_champion')
+    footballers = {}
+    bonus = {}
+    for player_id, footballer_id, is_top_scorer, is_champion in extra_bets:
+        footballers[player_id] = footballer_id
+        bonus[player_id] = extra_bet_points(0, is_top_scorer, is_champion, other_points)
+
+    goals = defaultdict(Counter)
+    for match_id, footballer_id in GoalScorer.objects.filter(match__in=matches).order_by() \
+            .values_list('match', 'footballer'):
+        goals[match_id][footballer_id] += 1
+
+    last_match = finished_matches().last()
+    snapshots = []
+    for finished in matches:
+        match_points = dict(Bet.objects.filter(match=finished).order_by().values_list('player', 'points'))
+        for player_id, footballer_id in footballers.items():
+            goal_points = extra_bet_points(goals[finished.id][footballer_id], False, False, other_points)
+            match_points[player_id] = (match_points.get(player_id) or 0) + goal_points
+        for player_id, points in match_points.items():
+            totals[player_id] = totals.get(player_id, 0) + (points or 0)
+
+        bonus_points = bonus if finished == last_match else {}
+        ranking = sorted(((player_id, points + bonus_points.get(player_id, 0)) for player_id, points in totals.items()),
+                         key=lambda item: -item[1])
+        for place, (player_id, points) in _with_places(ranking, lambda item: item[1]):
+            snapshots.append(StandingsSnapshot(match=finished,
+                                               player_id=player_id,
+                                               match_points=match_points.get(player_id) or 0,
+                                               points=points,
+                                               bonus_points=bonus_points.get(player_id, 0),
+                                               place=place))
+
+    with transaction.atomic():
+        StandingsSnapshot.objects.filter(Q(match=match) | Q(match__in=matches)).delete()
+        StandingsSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+# Queued instead of a match id when top scorer or champion changed; no match has primary key 0.
+LAST_FINISHED_MATCH = 0
+
+
+@receiver(rescored)
+def record_snapshots_on_rescore(sender, match=None, goal_matches=(), **kwargs):
+    # A result or a goal changes the snapshots from its match on. Top scorer and champion points only appear
+    # in the snapshots of the last finished match.
+    if match is not None:
+        match_ids = [match.pk]
+    else:
+        match_ids = goal_matches or [LAST_FINISHED_MATCH]
+    for match_id in match_ids:
+        on_commit_batched('standings', _record_snapshots_from_earliest, match_id)
+
+
+def _record_snapshots_from_earliest(match_ids):
+    if LAST_FINISHED_MATCH in match_ids:
+        match_ids = set(match_ids) | set(finished_matches().reverse().values_list('id', flat=True)[:1])
+    match = Match.objects.filter(pk__in=match_ids).order_by('date_and_time', 'id').first()
+    if match is not None:
+        record_snapshots(match)
@@ -1,3 +1,721 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.test import TestCase, TransactionTestCase, SimpleTestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from .models import User, ScoringSystem, Team, Footballer, Match, GoalScorer, Bet, ExtraBets, BetReminder, \
+    MatchBetStats, LiveUpdate, StandingsSnapshot, Projection, PlayerProjection
+from .bet_stats import close_betting
+from .choices import team_choices, search_footballers
+from .standings import standings, head_to_head, record_snapshots
+from . import live, projection, reference, standings as standings_module
+from .scoring import bet_points
+from .signals import rescored, on_commit_batched
+from .snapshots import write_if_changed
+from .routers import ReplicaRouter, PinPrimaryMiddleware, PIN_COOKIE, read_from_replica, use_replica
+from .management.commands.export_columnar import np
+
+
+class ScoringTestData:
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = ScoringSystem.objects.create(evaluated_field='Group', short_name='GR',
+                                                 result_hitted=3, goal_diff_hitted=2, direction_hitted=1)
+        ScoringSystem.objects.create(evaluated_field='Goal', short_name='GOL', other_points=1)
+        ScoringSystem.objects.create(evaluated_field='Top Scorer', short_name='TSC', other_points=5)
+        ScoringSystem.objects.create(evaluated_field='World Champion', short_name='WCH', other_points=10)
+
+        cls.home_team = Team.objects.create(name='Poland', short_name='POL')
+        cls.away_team = Team.objects.create(name='Senegal', short_name='SEN')
+        cls.footballer = Footballer.objects.create(name='Robert Lewandowski', team=cls.home_team)
+        cls.match = Match.objects.create(home_team=cls.home_team, away_team=cls.away_team,
+                                         date_and_time=timezone.now() + timezone.timedelta(days=1),
+                                         tournament_stage=cls.group)
+
+        cls.players = [User.objects.create_user(f'player{number}@example.com', 'password',
+                                                first_name='Player', last_name=str(number))
+                       for number in range(3)]
+        for number, player in enumerate(cls.players):
+            Bet.objects.create(match=cls.match, player=player, home_score=number, away_score=1)
+            ExtraBets.objects.create(player=player, team=cls.home_team, footballer=cls.footballer)
+
+
+class SaveCascadeTests(ScoringTestData, TestCase):
+    def test_team_rename_does_not_rescore(self):
+        team = Team.objects.get(pk=self.home_team.pk)
+        team.name = 'Polska'
+        with self.assertNumQueries(1):
+            team.save()
+
+    def test_footballer_rename_does_not_rescore(self):
+        footballer = Footballer.objects.get(pk=self.footballer.pk)
+        footballer.name = 'R. Lewandowski'
+        with self.assertNumQueries(1):
+            footballer.save()
+
+    def test_kickoff_change_does_not_rescore(self):
+        match = Match.objects.get(pk=self.match.pk)
+        match.date_and_time += timezone.timedelta(hours=2)
+        with self.assertNumQueries(1):
+            match.save()
+
+    def test_result_rescores_bets_of_the_match(self):
+        match = Match.objects.get(pk=self.match.pk)
+        match.home_score, match.away_score = 1, 1
+        match.save()
+        self.assertEqual(list(Bet.objects.order_by('player__last_name').values_list('points', flat=True)),
+                         [0, 3, 0])
+
+        match.home_score, match.away_score = None, None
+        match.save()
+        self.assertEqual(set(Bet.objects.values_list('points', flat=True)), {0})
+
+    def test_champion_rescores_extra_bets(self):
+        team = Team.objects.get(pk=self.home_team.pk)
+        team.is_champion = True
+        team.save()
+        self.assertEqual(set(ExtraBets.objects.values_list('points', flat=True)), {10})
+
+    def test_goal_scorer_rescores_previous_and_new_footballer(self):
+        other = Footballer.objects.create(name='Sadio Mane', team=self.away_team)
+        goal = GoalScorer.objects.create(footballer=self.footballer, match=self.match)
+        self.assertEqual(set(ExtraBets.objects.values_list('points', flat=True)), {1})
+
+        goal = GoalScorer.objects.get(pk=goal.pk)
+        goal.footballer = other
+        goal.save()
+        self.assertEqual(set(ExtraBets.objects.values_list('points', flat=True)), {0})
+
+
+class AvailableBetTests(ScoringTestData, TestCase):
+    def setUp(self):
+        reference.reset()
+
+    @staticmethod
+    def old_available_bet_ids():
+        # Match.available_bet_list() as it was before the calendar was kept in memory.
+        matches = Match.objects.all()
+        list_of_teams = []
+        for match in matches:
+            if not match.is_inside_date_ranges or match.home_team in list_of_teams or match.away_team in list_of_teams:
+                matches = matches.exclude(id=match.id)
+            else:
+                list_of_teams.append(match.home_team)
+                list_of_teams.append(match.away_team)
+        return set(matches.values_list('id', flat=True))
+
+    def create_match(self, home_team, away_team, days):
+        return Match.objects.create(home_team=home_team, away_team=away_team, tournament_stage=self.group,
+                                    date_and_time=timezone.now() + timezone.timedelta(days=days))
+
+    def test_same_matches_as_before(self):
+        japan = Team.objects.create(name='Japan', short_name='JPN')
+        colombia = Team.objects.create(name='Colombia', short_name='COL')
+        open_match = self.create_match(japan, colombia, 2)
+        self.create_match(self.home_team, japan, 2.5)  # Poland plays self.match first.
+        self.create_match(colombia, self.away_team, -1)  # Kicked off.
+        self.create_match(japan, self.away_team, 5)  # Too far ahead.
+
+        self.assertEqual(Match.available_bet_ids(), {self.match.pk, open_match.pk})
+        self.assertEqual(Match.available_bet_ids(), self.old_available_bet_ids())
+        self.assertEqual([match.available_for_betting for match in Match.objects.all()],
+                         [match.pk in Match.available_bet_ids() for match in Match.objects.all()])
+
+    def test_calendar_reloads_when_version_changes(self):
+        self.assertEqual(Match.available_bet_ids(), {self.match.pk})
+        japan = Team.objects.create(name='Japan', short_name='JPN')
+        colombia = Team.objects.create(name='Colombia', short_name='COL')
+        # Bulk created, so no signal tells this process about the new match.
+        Match.objects.bulk_create([Match(home_team=japan, away_team=colombia, tournament_stage=self.group,
+                                         date_and_time=timezone.now() + timezone.timedelta(days=1))])
+        new_match = Match.objects.get(home_team=japan)
+
+        with mock.patch('betapp.reference.VERSION_CHECK_SECONDS', 3600):
+            self.assertEqual(Match.available_bet_ids(), {self.match.pk})
+        with mock.patch('betapp.reference.VERSION_CHECK_SECONDS', 0), self.assertNumQueries(4):
+            # Version check over scoring systems and matches, then both reloaded.
+            self.assertEqual(Match.available_bet_ids(), {self.match.pk, new_match.pk})
+
+
+class ChoicesTests(ScoringTestData, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_saved_footballer_is_found_at_once(self):
+        self.assertEqual(search_footballers('sad'), [])
+        Footballer.objects.create(name='Sadio Mane', team=self.away_team)
+        self.assertEqual([row['name'] for row in search_footballers('sad')], ['Sadio Mane'])
+
+    @mock.patch('betapp.choices.VERSION_CHECK_SECONDS', 0)
+    def test_bulk_created_rows_are_found_after_version_check(self):
+        self.assertEqual(len(team_choices()), 2)
+        Team.objects.bulk_create([Team(name='Japan', short_name='JPN')])
+        team = Team.objects.get(name='Japan')
+        Footballer.objects.bulk_create([Footballer(name='Takumi Minamino', team=team)])
+        self.assertIn((team.pk, 'Japan'), team_choices())
+        self.assertEqual([row['team'] for row in search_footballers('taku')], ['Japan'])
+
+
+class OnCommitBatchedTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def queue(self, *values):
+        for value in values:
+            on_commit_batched('test', self.calls.append, value)
+
+    def commit(self):
+        # The test case's transaction never commits: run what a commit would.
+        callbacks = [callback for _, callback in connection.run_on_commit]
+        connection.run_on_commit = []
+        for callback in callbacks:
+            callback()
+
+    def test_runs_once_per_transaction_with_all_values(self):
+        self.queue(1, None, 2, 1)
+        self.commit()
+        self.queue(3)
+        self.commit()
+        self.assertEqual(self.calls, [{1, 2}, {3}])
+
+    def test_runs_when_last_callback_was_rolled_back(self):
+        self.queue(1)
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            self.queue(2)
+            1 / 0
+        self.commit()
+        self.assertEqual(len(self.calls), 1)
+
+    def test_rolled_back_values_are_not_passed_on(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            self.queue(1)
+            1 / 0
+        self.queue(2)
+        self.commit()
+        self.assertEqual(self.calls, [{2}])
+
+    def test_runs_at_once_outside_transactions(self):
+        with mock.patch('betapp.signals.transaction.on_commit', lambda func: func()):
+            self.queue(1)
+            self.queue(2)
+        self.assertEqual(self.calls, [{1}, {2}])
+
+
+class LiveStreamTests(TestCase):
+    def setUp(self):
+        live._events.update(events=(), checked=0.0)
+
+    @mock.patch('betapp.live.time.sleep')
+    def test_open_streams_share_one_query(self, sleep):
+        first = LiveUpdate.objects.create(kind=LiveUpdate.RESULT, payload='{"match": 1}')
+        LiveUpdate.objects.create(kind=LiveUpdate.RESULT, payload='{"match": 2}')
+        streams = [live.event_stream(first.id) for _ in range(3)]
+        with self.assertNumQueries(1):
+            for stream in streams:
+                next(stream)
+                self.assertIn('data: {"match": 2}', next(stream))
+
+
+class BetRemindersTests(ScoringTestData, TestCase):
+    def test_reminds_players_without_bet_once(self):
+        User.objects.filter(email__startswith='player').update(is_active=True)
+        late = User.objects.create_user('late@example.com', 'password', first_name='Late', last_name='Player',
+                                        is_active=True)
+
+        call_command('send_bet_reminders', '--hours', '48', '--rate', '0', stdout=StringIO())
+        self.assertEqual([message.to for message in mail.outbox], [[late.email]])
+        self.assertTrue(BetReminder.objects.filter(match=self.match, player=late).exists())
+
+        call_command('send_bet_reminders', '--hours', '48', '--rate', '0', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_logs_messages_sent_before_a_failure(self):
+        User.objects.filter(email__startswith='player').update(is_active=True)
+        for name in ('First', 'Second'):
+            User.objects.create_user(f'{name.lower()}@example.com', 'password', first_name=name, last_name='Player',
+                                     is_active=True)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=[1, OSError]):
+            with self.assertRaises(OSError):
+                call_command('send_bet_reminders', '--hours', '48', '--rate', '0', '--workers', '1',
+                             stdout=StringIO())
+        self.assertEqual(BetReminder.objects.filter(match=self.match).count(), 1)
+
+    def test_skips_matches_kicking_off_later(self):
+        User.objects.create_user('late@example.com', 'password', first_name='Late', last_name='Player',
+                                 is_active=True)
+        call_command('send_bet_reminders', '--hours', '1', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class BetStatsTests(ScoringTestData, TestCase):
+    def test_distribution_stored_once_betting_closes(self):
+        self.assertEqual(close_betting(), 0)
+
+        Match.objects.filter(pk=self.match.pk).update(date_and_time=timezone.now())
+        self.assertEqual(close_betting(), 1)
+        stats = MatchBetStats.objects.get(match=self.match)
+        self.assertEqual((stats.bets_count, stats.home_wins, stats.draws, stats.away_wins), (3, 1, 1, 1))
+        self.assertEqual(sorted(stats.scorelines.values_list('home_score', 'away_score', 'count')),
+                         [(0, 1, 1), (1, 1, 1), (2, 1, 1)])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(close_betting(), 0)
+
+
+class HeadToHeadTests(ScoringTestData, TestCase):
+    def test_running_difference_to_first_player(self):
+        match = Match.objects.get(pk=self.match.pk)
+        match.home_score, match.away_score = 1, 1
+        match.save()
+
+        rows = head_to_head([self.players[0], self.players[1]])
+        self.assertEqual(len(rows), 1)
+        self.assertEqual([(total, difference) for _, total, difference in rows[0]['cells']], [(0, 0), (3, 3)])
+
+    def test_matches_without_result_are_left_out(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(head_to_head(self.players), [])
+
+
+class StandingsSnapshotTests(ScoringTestData, TestCase):
+    def assert_last_snapshots_match_standings(self, match):
+        snapshots = {snapshot.player_id: (snapshot.points, snapshot.place)
+                     for snapshot in StandingsSnapshot.objects.filter(match=match)}
+        self.assertEqual(snapshots, {row['player'].pk: (row['total_points'], row['place']) for row in standings()})
+
+    def test_snapshots_include_extra_bet_points(self):
+        match = Match.objects.get(pk=self.match.pk)
+        match.home_score, match.away_score = 1, 1
+        match.save()
+        GoalScorer.objects.create(footballer=self.footballer, match=match)
+        team = Team.objects.get(pk=self.home_team.pk)
+        team.is_champion = True
+        team.save()
+        ExtraBets.objects.filter(player=self.players[2]).update(team=self.away_team, points=1)
+
+        record_snapshots(match)
+        self.assert_last_snapshots_match_standings(match)
+        self.assertEqual(StandingsSnapshot.objects.get(match=match, player=self.players[1]).match_points, 4)
+
+        # Champion points move to the next finished match instead of being carried over twice.
+        later = Match.objects.create(home_team=self.home_team, away_team=self.away_team, home_score=0, away_score=0,
+                                     date_and_time=match.date_and_time + timezone.timedelta(days=1),
+                                     tournament_stage=self.group)
+        record_snapshots(later)
+        self.assert_last_snapshots_match_standings(later)
+        self.assertEqual(StandingsSnapshot.objects.filter(match=match, bonus_points__gt=0).count(), 0)
+
+    def test_extra_bet_rescores_rewrite_only_affected_snapshots(self):
+        match = Match.objects.get(pk=self.match.pk)
+        match.home_score, match.away_score = 1, 1
+        match.save()
+        later = Match.objects.create(home_team=self.home_team, away_team=self.away_team, home_score=0, away_score=0,
+                                     date_and_time=match.date_and_time + timezone.timedelta(days=1),
+                                     tournament_stage=self.group)
+        team = Team.objects.get(pk=self.home_team.pk)
+        team.is_champion = True
+        with mock.patch('betapp.standings.on_commit_batched') as queued:
+            GoalScorer.objects.create(footballer=self.footballer, match=match)
+            team.save()
+        self.assertEqual([call[0][2] for call in queued.call_args_list],
+                         [match.pk, standings_module.LAST_FINISHED_MATCH])
+
+        with mock.patch('betapp.standings.record_snapshots') as record:
+            standings_module._record_snapshots_from_earliest({standings_module.LAST_FINISHED_MATCH})
+            standings_module._record_snapshots_from_earliest({later.pk, match.pk})
+        self.assertEqual([call[0][0] for call in record.call_args_list], [later, match])
+
+
+class LogoutTests:
+    def test_logged_out_session_cookie_is_rejected(self):
+        self.client.get(reverse('license'))
+        session_cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.get(reverse('logout'))
+
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_cookie
+        self.assertRedirects(self.client.get(reverse('license')), f'{reverse("login")}?next={reverse("license")}')
+
+
+class DatabaseSessionTests(LogoutTests, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('player@example.com', 'password', is_active=True)
+        self.client.force_login(self.user)
+
+    def test_database_sessions_without_shared_cache(self):
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+        self.assertIn('django.contrib.auth.middleware.AuthenticationMiddleware', settings.MIDDLEWARE)
+
+
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    MIDDLEWARE=[name.replace('django.contrib.auth.middleware.AuthenticationMiddleware',
+                             'betapp.user_cache.CachedUserMiddleware') for name in settings.MIDDLEWARE],
+)
+class CachedUserTests(LogoutTests, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('player@example.com', 'password', is_active=True)
+        self.client.force_login(self.user)
+
+    def test_cached_session_and_user_make_no_queries(self):
+        self.client.get(reverse('license'))
+        # Only the view's own InfoText lookup is left.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('license'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_password_change_logs_out_cached_user(self):
+        self.client.get(reverse('license'))
+        self.user.set_password('new password')
+        self.user.save()
+        self.assertRedirects(self.client.get(reverse('license')), f'{reverse("login")}?next={reverse("license")}')
+
+
+@mock.patch('betapp.routers.replicas', return_value=['replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def read_alias(self, request):
+        return HttpResponse(self.router.db_for_read(Bet))
+
+    def test_reads_use_primary_outside_read_only_views(self, replicas):
+        self.assertEqual(self.router.db_for_read(Bet), 'default')
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Bet), 'replica_1')
+            self.assertEqual(self.router.db_for_write(Bet), 'default')
+
+    def test_reads_use_primary_without_replicas(self, replicas):
+        replicas.return_value = []
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Bet), 'default')
+
+    def test_read_only_view_uses_replica(self, replicas):
+        view = use_replica(self.read_alias)
+        self.assertEqual(view(self.factory.get('/')).content, b'replica_1')
+        self.assertEqual(view(self.factory.post('/')).content, b'default')
+
+    def test_browser_reads_from_primary_after_own_write(self, replicas):
+        middleware = PinPrimaryMiddleware(lambda request: HttpResponseRedirect('/'))
+        response = middleware(self.factory.post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        self.assertEqual(use_replica(self.read_alias)(request).content, b'default')
+
+
+class ReplicaMirrorTests(TransactionTestCase):
+    """Decorated views end to end through the router, with a replica alias mirroring the test database.
+
+    A transaction test case, so rows written through the primary connection are visible to the replica one.
+    """
+    REPLICA = 'replica_1'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # What the test runner does for an alias configured with TEST={'MIRROR': 'default'}.
+        connections.databases[cls.REPLICA] = dict(connections['default'].settings_dict, TEST={'MIRROR': 'default'})
+        connections[cls.REPLICA].creation.set_as_test_mirror(connections['default'].settings_dict)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[cls.REPLICA].close()
+        del connections[cls.REPLICA]
+        del connections.databases[cls.REPLICA]
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user('player@example.com', 'password', is_active=True)
+        team = Team.objects.create(name='Poland', short_name='POL')
+        match = Match.objects.create(home_team=team, away_team=Team.objects.create(name='Senegal', short_name='SEN'),
+                                     date_and_time=timezone.now(), home_score=1, away_score=2,
+                                     tournament_stage=ScoringSystem.objects.create(evaluated_field='Group'))
+        StandingsSnapshot.objects.create(match=match, player=self.user, points=0, place=1)
+        Bet.objects.create(match=match, player=self.user, home_score=1, away_score=2)
+        close_betting()
+        self.client.force_login(self.user)
+
+    def get(self, url_name, **cookies):
+        for name, value in cookies.items():
+            self.client.cookies[name] = value
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[self.REPLICA]) as replica:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response, len(primary), len(replica)
+
+    def test_read_only_view_reads_from_replica(self):
+        response, primary, replica = self.get('rank_history_json')
+        self.assertEqual(response.json()['players'], {str(self.user.pk): [
+            {'match': StandingsSnapshot.objects.get().match_id, 'points': 0, 'place': 1}]})
+        # Session and user are read by the middleware before the view, from the primary.
+        self.assertEqual((primary, replica), (2, 1))
+
+    def test_pinned_browser_reads_from_primary(self):
+        self.assertEqual(self.get('rank_history_json', **{PIN_COOKIE: '1'})[1:], (3, 0))
+
+    def test_template_responses_render_from_replica(self):
+        for url_name, text in (('match_list', 'Poland'), ('all_bets_list', 'POL - SEN')):
+            with self.subTest(url_name):
+                response, primary, replica = self.get(url_name)
+                self.assertContains(response, text)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 1)
+
+
+# Tables that grow with the league; their plans must use indexes.
+LARGE_TABLES = {'betapp_bet'}
+# Sorts of more rows than this are reported, smaller ones are what indexes narrow queries down to.
+SORTED_ROWS_LIMIT = 1000
+
+
+def plan_problems(node):
+    """Return the sequential scans and large sorts of large tables in an ``EXPLAIN (FORMAT JSON)`` plan node."""
+    def relations(node):
+        # Rows that feed a node; subplans run once per row and are checked on their own.
+        yield node.get('Relation Name')
+        for child in node.get('Plans', []):
+            if child.get('Parent Relationship') not in ('SubPlan', 'InitPlan'):
+                yield from relations(child)
+
+    problems = []
+    if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in LARGE_TABLES:
+        problems.append(f'Seq Scan on {node["Relation Name"]}')
+    if node['Node Type'] in ('Sort', 'Incremental Sort') and node['Plan Rows'] > SORTED_ROWS_LIMIT \
+            and LARGE_TABLES.intersection(relations(node)):
+        problems.append(f'Sort of {node["Plan Rows"]} rows by {", ".join(node["Sort Key"])}')
+    for child in node.get('Plans', []):
+        problems.extend(plan_problems(child))
+    return problems
+
+
+@skipUnless(projection.np is not None, 'Standings projection requires NumPy.')
+class ProjectionTests(ScoringTestData, TestCase):
+    def test_points_tables_match_bet_points(self):
+        stage = ScoringSystem(result_hitted=5, goal_diff_hitted=3, direction_hitted=1)
+        goals = range(projection.MAX_GOALS)
+        bets = [(None, None)] + [(home, away) for home in goals for away in goals]
+        bet_home = projection.np.array([[-1 if home is None else home] for home, _ in bets], dtype='int16')
+        bet_away = projection.np.array([[-1 if away is None else away] for _, away in bets], dtype='int16')
+        tables = projection._points_tables(bet_home, bet_away, projection.np.array([[5, 3, 1]]))
+
+        for home in goals:
+            for away in goals:
+                self.assertEqual(tables[0, home * projection.MAX_GOALS + away].tolist(),
+                                 [bet_points(home, away, bet_home, bet_away, stage) for bet_home, bet_away in bets])
+
+    def test_page_shows_stored_projection_without_simulating(self):
+        User.objects.filter(pk=self.players[0].pk).update(is_active=True)
+        self.client.force_login(self.players[0])
+        with mock.patch('betapp.projection.project') as project:
+            self.assertContains(self.client.get(reverse('projection')), 'not been simulated yet')
+        project.assert_not_called()
+
+        call_command('project_standings', '--samples', '100', '--workers', '1', '--seed', '1', stdout=StringIO())
+        with self.assertNumQueries(4):  # Session, user, projection and its players.
+            response = self.client.get(reverse('projection'))
+        self.assertEqual([row.player for row in response.context['players_list']], self.players)
+
+    def test_refresh_replaces_stored_projection(self):
+        projection.refresh_projection(samples=100, workers=1, seed=1)
+        stored = projection.refresh_projection(samples=200, workers=1, seed=2)
+        self.assertEqual((Projection.objects.get(), stored.samples), (stored, 200))
+        self.assertEqual(PlayerProjection.objects.count(), len(self.players))
+        self.assertAlmostEqual(sum(stored.players.values_list('win', flat=True)), 1)
+
+    def test_projection_without_players(self):
+        User.objects.all().delete()
+        self.assertEqual(projection.project(samples=100, workers=1)[0], [])
+
+
+class SnapshotTests(ScoringTestData, TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+    def read(self, name):
+        with open(os.path.join(self.root, name)) as snapshot_file:
+            return json.load(snapshot_file)
+
+    def test_write_if_changed(self):
+        path = os.path.join(self.root, 'standings.json')
+        self.assertTrue(write_if_changed(path, b'[]'))
+        inode = os.stat(path).st_ino
+        self.assertFalse(write_if_changed(path, b'[]'))
+        self.assertEqual(os.stat(path).st_ino, inode)
+
+        # Replaced by renaming a complete temporary file over it, never written in place.
+        self.assertTrue(write_if_changed(path, b'[1]'))
+        self.assertNotEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(os.listdir(self.root), ['standings.json'])
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+        self.assertEqual(self.read('standings.json'), [1])
+
+    def test_published_after_rescoring(self):
+        match = Match.objects.get(pk=self.match.pk)
+        match.home_score, match.away_score = 1, 1
+        with override_settings(SNAPSHOT_ROOT=self.root), \
+                mock.patch('betapp.snapshots.on_commit_batched', lambda name, func, value=None: func({value})):
+            match.save()
+        self.assertEqual([row['total_points'] for row in self.read('standings.json')], [3, 0, 0])
+        self.assertEqual(self.read('results.json')[0]['home_score'], 1)
+
+    def test_published_when_betting_closes(self):
+        Match.objects.filter(pk=self.match.pk).update(date_and_time=timezone.now())
+        with override_settings(SNAPSHOT_ROOT=self.root):
+            call_command('close_betting', stdout=StringIO())
+        self.assertEqual([player['bets'] for player in self.read('all_bets.json')],
+                         [{str(self.match.pk): [number, 1, 0]} for number in range(3)])
+
+
+class ImportTournamentTests(TestCase):
+    DATA = {
+        'scoring_systems': [
+            {'evaluated_field': 'Group', 'short_name': 'GR', 'result_hitted': 3, 'goal_diff_hitted': 2,
+             'direction_hitted': 1},
+            {'evaluated_field': 'Goal', 'short_name': 'GOL', 'other_points': 1},
+            {'evaluated_field': 'Top Scorer', 'short_name': 'TSC', 'other_points': 5},
+            {'evaluated_field': 'World Champion', 'short_name': 'WCH', 'other_points': 10},
+        ],
+        'teams': [{'name': 'Poland', 'short_name': 'POL'}, {'name': 'Senegal', 'short_name': 'SEN'}],
+        'footballers': [{'name': 'Robert Lewandowski', 'team': 'Poland'}],
+        'matches': [
+            {'home_team': 'Poland', 'away_team': 'Senegal', 'tournament_stage': 'Group',
+             'date_and_time': '2018-06-19T17:00:00', 'home_score': 1, 'away_score': 2},
+            {'home_team': 'Senegal', 'away_team': 'Poland', 'tournament_stage': 'Group',
+             'date_and_time': '2018-06-24T20:00:00'},
+        ],
+        'goal_scorers': [{'footballer': 'Robert Lewandowski', 'home_team': 'Poland', 'away_team': 'Senegal',
+                          'tournament_stage': 'Group'}],
+    }
+
+    def import_data(self, data):
+        sent = []
+
+        def receive(sender, match=None, **kwargs):
+            sent.append((sender, match))
+
+        rescored.connect(receive)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'tournament.json')
+                with open(path, 'w') as json_file:
+                    json.dump(data, json_file)
+                call_command('import_tournament', path, stdout=StringIO())
+        finally:
+            rescored.disconnect(receive)
+        return sent
+
+    def test_reimport_updates_results_and_rescores(self):
+        sent = self.import_data(self.DATA)
+        match = Match.objects.get(home_team__name='Poland')
+        self.assertEqual(sent, [(Match, match), (ExtraBets, None)])
+
+        player = User.objects.create_user('player@example.com', 'password')
+        Bet.objects.create(match=match, player=player, home_score=1, away_score=1)
+        ExtraBets.objects.create(player=player, team=Team.objects.get(name='Poland'),
+                                 footballer=Footballer.objects.get(name='Robert Lewandowski'))
+
+        data = dict(self.DATA, footballers=[{'name': 'Robert Lewandowski', 'team': 'Senegal'}],
+                    matches=[dict(self.DATA['matches'][0], home_score=2, away_score=2), self.DATA['matches'][1]])
+        del data['goal_scorers']
+        sent = self.import_data(data)
+
+        self.assertEqual(sent, [(Match, match)])
+        self.assertEqual(Match.objects.filter(home_score__isnull=False).values_list('home_score', 'away_score')
+                         .get(), (2, 2))
+        self.assertEqual(Footballer.objects.get().team.name, 'Senegal')
+        self.assertEqual(Bet.objects.get().points, 2)
+        self.assertEqual(ExtraBets.objects.get().points, 1)
+        self.assertEqual((Match.objects.count(), GoalScorer.objects.count()), (2, 1))
+
+
+@skipUnless(np is not None, 'Columnar export requires NumPy.')
+class ExportColumnarTests(ScoringTestData, TestCase):
+    def test_any_saved_score_is_exported(self):
+        Bet.objects.filter(player=self.players[0]).update(home_score=200, away_score=32767, points=None)
+        with tempfile.TemporaryDirectory() as output:
+            call_command('export_columnar', output, '--tables', 'bets', stdout=StringIO())
+            columns = {name: np.load(os.path.join(output, 'bets', f'{name}.npy'))
+                       for name in ('player_id', 'home_score', 'away_score', 'points')}
+        row = list(columns['player_id']).index(self.players[0].pk)
+        self.assertEqual([int(columns[name][row]) for name in ('home_score', 'away_score', 'points')],
+                         [200, 32767, -1])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL only.')
+class QueryPlanTests(TestCase):
+    """Run EXPLAIN on the queries of the hot code paths against a league-sized dataset."""
+
+    players = 2000
+    matches = 64
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = ScoringSystem.objects.create(evaluated_field='Group', short_name='GR',
+                                                 result_hitted=3, goal_diff_hitted=2, direction_hitted=1)
+        teams = Team.objects.bulk_create([Team(name=f'Team {number}', short_name=f'T{number:02d}')
+                                          for number in range(32)])
+        kickoff = timezone.now() - timezone.timedelta(hours=1)
+        Match.objects.bulk_create([Match(home_team=teams[number % 32], away_team=teams[(number + 1) % 32],
+                                         tournament_stage=cls.group,
+                                         date_and_time=kickoff + timezone.timedelta(hours=6 * number))
+                                   for number in range(cls.matches)])
+        User.objects.bulk_create([User(email=f'player{number}@example.com', first_name='Player',
+                                       last_name=str(number), is_active=True)
+                                  for number in range(cls.players)], batch_size=500)
+        cls.user = User.objects.earliest('pk')
+        match_ids = list(Match.objects.values_list('id', flat=True))
+        Bet.objects.bulk_create([Bet(match_id=match_id, player_id=player_id, home_score=player_id % 4, away_score=1)
+                                 for player_id in User.objects.values_list('id', flat=True)
+                                 for match_id in match_ids], batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertIndexedQueries(self, function):
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + query['sql'])
+                plan = cursor.fetchone()[0]
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                self.assertEqual(plan_problems(plan[0]['Plan']), [], query['sql'])
+
+    def test_standings(self):
+        self.assertIndexedQueries(standings)
+
+    def test_head_to_head(self):
+        self.assertIndexedQueries(lambda: head_to_head(list(User.objects.all()[:2])))
+
+    def test_rescore_one_match(self):
+        match = Match.objects.earliest('date_and_time')
+        self.assertIndexedQueries(lambda: match.bets.all().rescore())
+
+    def test_close_betting(self):
+        self.assertIndexedQueries(close_betting)
+
+    def test_player_pages(self):
+        self.client.force_login(self.user)
+        for name in ('index', 'match_list', 'bet_formset'):
+            with self.subTest(name):
+                self.assertIndexedQueries(lambda: self.client.get(reverse(name)))
@@ -28,7 +28,13 @@ urlpatterns = [
     path('bet_form/<int:pk>', views.bet_form_view, name='bet_form'),
     path('bet_formset/', views.bet_formset_view, name='bet_formset'),
     path('extra_bets_form/', views.extra_bets_form_view, name='extra_bets'),
+    path('footballer_autocomplete/', views.footballer_autocomplete, name='footballer_autocomplete'),
     path('players_table/', views.players_table_view, name='players_table'),
+    path('projection/', views.projection_view, name='projection'),
+    path('live_updates/', views.live_updates_view, name='live_updates'),
+    path('rank_history/', views.rank_history_view, name='rank_history'),
+    path('rank_history.json', views.rank_history_json, name='rank_history_json'),
+    path('compare/', views.compare_view, name='compare'),
     path('all_bets_list/', views.AllBetsListView.as_view(), name='all_bets_list'),
     path('license/', views.info_license, name='license'),
     path('terms/', views.info_terms, name='terms'),
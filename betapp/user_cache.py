@@ -0,0 +1,68 @@
+"""Authenticated user read from the cache instead of the database on every request.
+
+Only enabled with a cache shared by all workers (see CACHES in betproject/settings.py): with per-process caches,
+an invalidation made by one worker would not reach the others.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from .models import User
+
+
+USER_KEY = 'user:{}'
+
+
+def get_user(request):
+    """Return the user of the session like ``django.contrib.auth.get_user``, from the cache when possible.
+
+    Users are cached by primary key, which the session holds, so one save invalidates every session of the user.
+    """
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    user = cache.get(USER_KEY.format(user_id))
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(USER_KEY.format(user.pk), user, settings.USER_CACHE_SECONDS)
+        return user
+
+    # Same check as auth.get_user: sessions started before a password change are logged out.
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(session_hash, user.get_session_auth_hash())):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedUserMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware that sets ``request.user`` from the cache."""
+
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    # Covers password changes, deactivation and the last_login update on login.
+    cache.delete(USER_KEY.format(instance.pk))
+
+
+@receiver(user_logged_out)
+def forget_user(sender, user, **kwargs):
+    if user is not None:
+        cache.delete(USER_KEY.format(user.pk))
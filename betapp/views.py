@@ -1,12 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import StreamingHttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
 from django.db.models import Sum
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView
 from django.forms import formset_factory
-from .models import User, Match, Bet, ExtraBets, InfoText
+from .models import User, Match, Bet, ExtraBets, InfoText, StandingsSnapshot
 from .forms import UserRegistrationForm, UserEditForm, BetForm, ExtraBetsForm
+from .standings import standings, head_to_head
+from .routers import use_replica
+from .choices import search_footballers
+from . import live, projection
 
 
 def register(request):
@@ -48,6 +55,7 @@ def edit(request):
 
 
 @login_required
+@use_replica
 def index_view(request):
     std_points = {}
     ext_points = {}
@@ -67,15 +75,24 @@ def index_view(request):
     return render(request, 'betapp/index.html', {'points': total_points})
 
 
+@method_decorator(use_replica, name='dispatch')
 class MatchListView(LoginRequiredMixin, ListView):
     model = Match
     template_name = 'betapp/match_list.html'
     context_object_name = 'matches'
     paginate_by = 15
 
-    @staticmethod
-    def bets():
-        return Bet.objects.all()
+    def get_queryset(self):
+        return super().get_queryset().select_related('bet_stats').prefetch_related('bet_stats__scorelines')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['live_last_id'] = live.latest_event_id()
+        return context
+
+    @cached_property
+    def bets(self):
+        return list(Bet.objects.filter(player=self.request.user).order_by())
 
 
 @login_required
@@ -116,7 +133,7 @@ def bet_formset_view(request):
                 bet.save()
         return redirect('match_list')
 
-    bets = Bet.objects.all()
+    bets = Bet.objects.filter(player=request.user, match__in=matches).order_by()
     match_formset_zip = zip(matches, formset)
     return render(request, 'betapp/bet_formset.html', {'matches': matches,
                                                        'formset': formset,
@@ -141,35 +158,78 @@ def extra_bets_form_view(request):
 
 
 @login_required
+@use_replica
+def footballer_autocomplete(request):
+    return JsonResponse({'results': search_footballers(request.GET.get('q', ''))})
+
+
+@login_required
+@use_replica
 def players_table_view(request):
-    users = User.objects.all()
-    players_list = []
-    std_points = {}
-    ext_points = {}
+    return render(request, 'betapp/players_table.html', {'players_list': standings(),
+                                                         'live_last_id': live.latest_event_id()})
 
-    for user in users:
-        if Bet.objects.filter(player=user).exists():
-            std_points = Bet.objects.filter(player=user).aggregate(Sum('points'))
-        else:
-            std_points['points__sum'] = 0
 
-        if ExtraBets.objects.filter(player=user).exists():
-            ext_points = ExtraBets.objects.filter(player=user).aggregate(Sum('points'))
-        else:
-            ext_points['points__sum'] = 0
+@login_required
+def live_updates_view(request):
+    last_id = request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_id', '')
+    last_id = int(last_id) if last_id.isdigit() else 0
+
+    response = StreamingHttpResponse(live.event_stream(last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
-        total_points = std_points['points__sum'] + ext_points['points__sum']
 
-        player = {'player': user,
-                  'standard_points': std_points['points__sum'],
-                  'extra_points': ext_points['points__sum'],
-                  'total_points': total_points}
+@login_required
+@use_replica
+def projection_view(request):
+    stored = projection.stored_projection()
+    players_list = stored.players.select_related('player') if stored is not None else None
+    return render(request, 'betapp/projection.html', {'available': projection.np is not None,
+                                                      'projection': stored,
+                                                      'players_list': players_list})
+
+
+@login_required
+@use_replica
+def rank_history_view(request):
+    snapshots = StandingsSnapshot.objects.filter(player=request.user) \
+        .select_related('match__home_team', 'match__away_team')
+    return render(request, 'betapp/rank_history.html', {'snapshots': snapshots})
+
+
+# Players shown side by side, including the one asking.
+MAX_COMPARED_PLAYERS = 5
+
+
+@login_required
+@use_replica
+def compare_view(request):
+    """Compare the bets of the logged in user with the players given as ``?player=<id>`` parameters."""
+    ids = [request.user.pk] + [int(pk) for pk in request.GET.getlist('player') if pk.isdigit()]
+    ids = list(dict.fromkeys(ids))[:MAX_COMPARED_PLAYERS]
+    users = User.objects.filter(pk__in=ids) \
+        .select_related('player_extra_bets__team', 'player_extra_bets__footballer').in_bulk()
+    players = [users[pk] for pk in ids if pk in users]
+    return render(request, 'betapp/compare.html', {'players': players, 'rows': head_to_head(players)})
+
+
+@login_required
+@use_replica
+def rank_history_json(request):
+    snapshots = StandingsSnapshot.objects.order_by('match__date_and_time', 'match', 'place')
+    if request.GET.get('player', '').isdigit():
+        snapshots = snapshots.filter(player=request.GET['player'])
 
-        players_list.append(player)
+    players = {}
+    for match_id, player_id, points, place in snapshots.values_list('match', 'player', 'points', 'place'):
+        players.setdefault(player_id, []).append({'match': match_id, 'points': points, 'place': place})
 
-    return render(request, 'betapp/players_table.html', {'players_list': players_list})
+    return JsonResponse({'players': players})
 
 
+@method_decorator(use_replica, name='dispatch')
 class AllBetsListView(LoginRequiredMixin, ListView):
     # queryset = Bet.objects.filter(match__date_and_time__lte=timezone.now()).order_by('match__date_and_time')
     model = User
@@ -182,7 +242,7 @@ class AllBetsListView(LoginRequiredMixin, ListView):
 
     @staticmethod
     def matches():
-        return Match.objects.filter(date_and_time__lte=timezone.now())
+        return Match.objects.filter(date_and_time__lte=timezone.now()).select_related('bet_stats')
 
     # @staticmethod
     # def players():
@@ -194,12 +254,14 @@ class AllBetsListView(LoginRequiredMixin, ListView):
 
 
 @login_required
+@use_replica
 def info_license(request):
     license = get_object_or_404(InfoText, slug='license')
     return render(request, 'betapp/infos/license.html', {'license': license})
 
 
 @login_required
+@use_replica
 def info_terms(request):
     terms = get_object_or_404(InfoText, slug='terms-use')
     return render(request, 'betapp/infos/terms.html', {'terms': terms})
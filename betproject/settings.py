@@ -49,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'betapp.routers.PinPrimaryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +89,44 @@ DATABASES = {
     }
 }
 
+# Read replicas: DJANGO_DB_REPLICAS="host1,host2" adds 'replica_1', 'replica_2', ... with the primary's credentials.
+# Only views decorated with betapp.routers.use_replica read from them.
+for number, host in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica_{number}'] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+
+DATABASE_ROUTERS = ['betapp.routers.ReplicaRouter']
+
+# Seconds a browser reads from the primary after its own write, to hide replication lag.
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+# DJANGO_MEMCACHED="host1:11211,host2:11211" shares the cache between worker processes and servers, and enables
+# cached sessions and users. Without it every process has its own in-memory cache, which cannot see a logout
+# or a password change handled by another worker, so sessions and users are then read from the database.
+
+if os.environ.get('DJANGO_MEMCACHED'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['DJANGO_MEMCACHED'].split(','),
+        }
+    }
+    # Sessions are read from the cache and written through to the database, so a cache restart logs nobody out.
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    MIDDLEWARE[MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware')] = \
+        'betapp.user_cache.CachedUserMiddleware'
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds betapp.user_cache.CachedUserMiddleware keeps the logged in user in the cache.
+USER_CACHE_SECONDS = 300
+
 
 # User substitution
 AUTH_USER_MODEL = 'betapp.User'
@@ -137,3 +176,14 @@ LOGIN_URL = reverse_lazy('login')
 LOGOUT_URL = reverse_lazy('logout')
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Standings projection: Monte Carlo samples per projection and worker processes (None: one per CPU).
+PROJECTION_SAMPLES = int(os.environ.get('DJANGO_PROJECTION_SAMPLES', 10000))
+PROJECTION_WORKERS = None
+
+# Directory the static standings/results/all bets snapshots are published to after rescoring and when the
+# close_betting command closes matches (None: disabled).
+SNAPSHOT_ROOT = os.environ.get('DJANGO_SNAPSHOT_ROOT')
+
+# Live updates: a server-sent events stream is closed after this many seconds and the browser reconnects.
+LIVE_STREAM_MAX_SECONDS = int(os.environ.get('DJANGO_LIVE_STREAM_MAX_SECONDS', 120))
@@ -3,6 +3,11 @@ WSGI config for betproject project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+Live updates keep one request open per viewer, so run it with threaded workers, e.g.:
+    gunicorn betproject.wsgi --worker-class gthread --workers 4 --threads 50 --preload
+
+With --preload the reference data below is loaded once in the master and shared by the forked workers.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/2.0/howto/deployment/wsgi/
 """
@@ -14,3 +19,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "betproject.settings")
 
 application = get_wsgi_application()
+
+from betapp.reference import preload  # noqa: E402 (needs the apps loaded by get_wsgi_application)
+
+preload()